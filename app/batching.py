@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class BatchingConfig:
+    max_batch_size: int = 8
+    max_wait_ms: float = 5.0
+
+
+class BatchingEngine:
+    """
+    Micro-batching dinámico: agrupa peticiones concurrentes (REST y MQTT)
+    en un solo forward del modelo.
+
+    Un único hilo worker toma la primera petición de la cola y espera como
+    máximo `max_wait_ms` a que lleguen más, hasta `max_batch_size`.
+    Así el modelo nunca corre en paralelo consigo mismo (sin sobre-suscripción
+    de hilos de torch) y bajo carga se amortiza el costo por llamada.
+
+    `batch_fn` puede devolver una excepción en el lugar de un item: solo ese
+    Future falla y los demás del lote reciben su resultado.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[Sequence[Any]], List[Any]],
+        cfg: BatchingConfig = BatchingConfig(),
+    ) -> None:
+        self._batch_fn = batch_fn
+        self._cfg = cfg
+        self._queue: "queue.Queue[Optional[tuple[Any, Future]]]" = queue.Queue()
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name="batching-engine", daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        if self._closed:
+            raise RuntimeError("BatchingEngine cerrado")
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def predict(self, item: Any) -> Any:
+        """Encola `item` y bloquea hasta tener su resultado."""
+        return self.submit(item).result()
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first: tuple[Any, Future]) -> List[tuple[Any, Future]]:
+        batch = [first]
+        deadline = time.monotonic() + self._cfg.max_wait_ms / 1000.0
+
+        while len(batch) < self._cfg.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                nxt = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if nxt is None:
+                # Re-encolamos la señal de cierre para salir tras este lote
+                self._queue.put(None)
+                break
+            batch.append(nxt)
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            # Descarta peticiones canceladas por el llamador
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self._batch_fn([item for item, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), res in zip(batch, results):
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.singleflight import SingleFlight
+from app.storage import StorageBackend
+
+
+@dataclass(frozen=True)
+class BlobCacheConfig:
+    cache_dir: str = "./.blob_cache"
+    max_bytes: int = 1 << 30
+    # Tiempo durante el cual se confía en la generación ya resuelta de un blob
+    # sin volver a consultar sus metadatos en GCS.
+    identity_ttl_s: float = 30.0
+
+
+class BlobCache:
+    """
+    Caché local de blobs direccionada por contenido.
+
+    La clave es (nombre del blob, generation/etag), así una re-subida del mismo
+    nombre nunca devuelve la versión vieja. El tamaño total está acotado con
+    desalojo LRU. La comparten ImageDownloader e InferenceService para que
+    cada imagen se descargue una sola vez.
+    """
+
+    def __init__(self, storage: StorageBackend, cfg: BlobCacheConfig = BlobCacheConfig()) -> None:
+        self.storage = storage
+        self._cfg = cfg
+        self._dir = Path(cfg.cache_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes (LRU al inicio)
+        self._total_bytes = 0
+        self._names: Dict[str, Tuple[str, str, float]] = {}  # blob_name -> (key, versión, resuelto_en)
+        self.hits = 0
+        self.misses = 0
+        self._inflight = SingleFlight("blob_download")
+
+        self._load_existing()
+
+    @staticmethod
+    def _key(blob_name: str, version: str) -> str:
+        return hashlib.sha256(f"{blob_name}#{version}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self._dir / key[:2] / key
+
+    def _load_existing(self) -> None:
+        files = [p for p in self._dir.glob("*/*") if p.is_file() and ".part-" not in p.name]
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for p in files:
+            size = p.stat().st_size
+            self._entries[p.name] = size
+            self._total_bytes += size
+
+    def _touch(self, key: str) -> None:
+        self._entries.move_to_end(key)
+
+    def _evict(self, keep: str) -> None:
+        while self._total_bytes > self._cfg.max_bytes and len(self._entries) > 1:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                self._touch(key)
+                continue
+            del self._entries[key]
+            self._total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_cached(self, blob_name: str) -> Optional[Path]:
+        """
+        Ruta local de `blob_name` si fue resuelto hace menos de
+        `identity_ttl_s` y sigue en caché. No hace ninguna llamada a GCS.
+        """
+        with self._lock:
+            memo = self._names.get(blob_name)
+            if memo and time.monotonic() - memo[2] < self._cfg.identity_ttl_s and memo[0] in self._entries:
+                self._touch(memo[0])
+                self.hits += 1
+                return self._path(memo[0])
+            self.misses += 1
+        return None
+
+    def cached_version(self, blob_name: str) -> Optional[str]:
+        """Generación/etag conocida de `blob_name` (dentro del TTL), sin llamar a GCS."""
+        with self._lock:
+            memo = self._names.get(blob_name)
+            if memo and time.monotonic() - memo[2] < self._cfg.identity_ttl_s:
+                return memo[1]
+        return None
+
+    def fetch(self, blob_name: str) -> Path:
+        """
+        Retorna la ruta local de `blob_name`, descargándolo solo si esa
+        generación aún no está en caché. Llamadas simultáneas por el mismo
+        blob comparten una sola consulta y una sola descarga.
+        """
+        cached = self.get_cached(blob_name)
+        if cached is not None:
+            return cached
+        return self._inflight.do(blob_name, self._fetch, blob_name)[0]
+
+    def _fetch(self, blob_name: str) -> Path:
+        now = time.monotonic()
+        blob = self.storage.get_blob(blob_name)
+        version = str(blob.generation or blob.etag)
+        key = self._key(blob_name, version)
+        path = self._path(key)
+
+        with self._lock:
+            if key in self._entries:
+                self._touch(key)
+                self._names[blob_name] = (key, version, now)
+                return path
+
+        # Escritura atómica: temp + rename, nunca se lee un archivo a medias
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.part-{threading.get_ident()}")
+        try:
+            self.storage.download_blob(blob, str(tmp))
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+        size = path.stat().st_size
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = size
+                self._total_bytes += size
+            self._touch(key)
+            self._names[blob_name] = (key, version, now)
+            self._evict(keep=key)
+
+        return path
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("iot-fire-ai")
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    name: str
+    generation: int
+    updated: float  # timestamp UNIX
+
+
+# lister(prefix, start_offset) -> blobs con nombre >= start_offset (orden lexicográfico,
+# igual que list_blobs de GCS). Permite probar el índice contra un bucket falso.
+BlobLister = Callable[[str, Optional[str]], Iterable[BlobInfo]]
+
+
+class LatestBlobIndex:
+    """
+    Índice en memoria de los blobs más recientes de un prefijo.
+
+    En vez de listar todo el prefijo en cada /predict, un hilo en segundo plano
+    lista solo lo nuevo a partir de un cursor (el mayor nombre visto) y cada
+    `full_rescan_s` hace un listado completo para captar nombres que no llegan
+    en orden y descartar los borrados. Cursor y top-k se persisten en
+    `state_path` para arrancar en caliente. `latest()` es O(1).
+    """
+
+    def __init__(
+        self,
+        lister: BlobLister,
+        prefix: str,
+        state_path: Optional[str] = None,
+        top_k: int = 100,
+        refresh_s: float = 5.0,
+        full_rescan_s: float = 600.0,
+    ) -> None:
+        self._lister = lister
+        self.prefix = prefix
+        self._state_path = Path(state_path) if state_path else None
+        self._top_k = top_k
+        self._refresh_s = refresh_s
+        self._full_rescan_s = full_rescan_s
+
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, BlobInfo] = {}
+        self._latest: Optional[BlobInfo] = None
+        self._cursor: Optional[str] = None
+        self._last_full = 0.0
+        self._loaded = False
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._load_state()
+
+    # --- Persistencia ---
+    def _load_state(self) -> None:
+        if not self._state_path or not self._state_path.exists():
+            return
+        try:
+            state = json.loads(self._state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning("Estado del índice de blobs ilegible, se reconstruye: %s", self._state_path)
+            return
+        if state.get("prefix") != self.prefix:
+            return
+        self._cursor = state.get("cursor")
+        self._merge(BlobInfo(**b) for b in state.get("blobs", []))
+        self._loaded = True
+        # Con estado persistido se arranca con refrescos incrementales
+        self._last_full = time.monotonic()
+
+    def _save_state(self) -> None:
+        if not self._state_path:
+            return
+        with self._lock:
+            state = {
+                "prefix": self.prefix,
+                "cursor": self._cursor,
+                "blobs": [asdict(b) for b in self._blobs.values()],
+            }
+        self._state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._state_path.with_name(self._state_path.name + ".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self._state_path)
+
+    # --- Índice ---
+    def _merge(self, infos: Iterable[BlobInfo], replace: bool = False) -> bool:
+        """
+        Incorpora `infos` al top-k. Con `replace` (listado completo) el top-k
+        se reconstruye solo con `infos`: los blobs borrados del bucket salen.
+        """
+        changed = False
+        with self._lock:
+            old = self._blobs
+            # Lo que no supere al más viejo del top-k actual no cuenta como cambio
+            floor = min((b.updated for b in old.values()), default=float("-inf")) \
+                if len(old) >= self._top_k and not replace else float("-inf")
+            blobs = {} if replace else dict(old)
+            cursor = None if replace else self._cursor
+
+        for info in infos:
+            if cursor is None or info.name > cursor:
+                cursor = info.name
+            if info.name not in blobs and info.updated <= floor:
+                continue
+            if blobs.get(info.name) != info:
+                blobs[info.name] = info
+                changed = True
+
+        newest: List[BlobInfo] = sorted(blobs.values(), key=lambda b: b.updated, reverse=True)
+        newest = newest[:self._top_k]
+        if replace:
+            changed = {b.name: b for b in newest} != old
+        with self._lock:
+            self._cursor = cursor
+            if changed:
+                self._blobs = {b.name: b for b in newest}
+                self._latest = newest[0] if newest else None
+        return changed
+
+    def refresh(self, full: bool = False) -> None:
+        start = None if full else self._cursor
+        changed = self._merge(self._lister(self.prefix, start), replace=full)
+        if full:
+            self._last_full = time.monotonic()
+        self._loaded = True
+        if changed:
+            self._save_state()
+
+    def latest(self) -> Optional[BlobInfo]:
+        """Blob más reciente conocido. Solo lista si el índice nunca se cargó."""
+        if not self._loaded:
+            self.refresh(full=True)
+        return self._latest
+
+    # --- Refresco en segundo plano ---
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"blob-index-{self.prefix}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            full = time.monotonic() - self._last_full >= self._full_rescan_s
+            try:
+                self.refresh(full=full)
+            except Exception:
+                logger.exception("Error refrescando índice de blobs '%s'", self.prefix)
+            self._stop.wait(self._refresh_s)
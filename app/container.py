@@ -1,4 +1,10 @@
 from app.inference import InferenceService
+from app.settings import settings
+from app.stream import ResultBroadcaster
 
-# ÚNICA instancia compartida en toda la app
+# ÚNICA instancia compartida en toda la app.
+# Construirla es barato: el modelo y GCS se cargan en ensure_loaded()/start_background().
 svc = InferenceService()
+
+# Resultados del pipeline MQTT hacia los suscriptores de /events/stream
+broadcaster = ResultBroadcaster(buffer_size=settings.STREAM_SUBSCRIBER_BUFFER)
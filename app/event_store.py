@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.metrics import Counter
+
+logger = logging.getLogger("iot-fire-ai")
+
+EVENTS_DROPPED = Counter(
+    "fire_event_store_dropped_total",
+    "Eventos no persistidos porque la cola de escritura estaba llena",
+)
+
+_COLUMNS = (
+    "ts", "source", "device", "image_blob", "status", "final_score",
+    "image_probability", "audio_probability", "model_version", "cache", "timings",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    device TEXT,
+    image_blob TEXT,
+    status TEXT NOT NULL,
+    final_score REAL NOT NULL,
+    image_probability REAL,
+    audio_probability REAL,
+    model_version TEXT,
+    cache TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_device_ts ON events (device, ts);
+CREATE INDEX IF NOT EXISTS events_status_ts ON events (status, ts);
+"""
+
+
+@dataclass(frozen=True)
+class EventStoreConfig:
+    path: str = "./.events/events.sqlite"
+    batch_size: int = 256
+    flush_interval_s: float = 0.5
+    queue_size: int = 10_000
+
+
+class EventStore:
+    """
+    Registro append-only de resultados puntuados (REST y MQTT) en SQLite WAL.
+
+    `append` no bloquea: encola y un único hilo escritor inserta por lotes
+    (`batch_size` eventos o cada `flush_interval_s`) en una transacción. Las
+    lecturas usan conexiones propias por hilo y, gracias a WAL, no esperan al
+    escritor.
+
+    `query` pagina por cursor sobre (ts, id) con índices (ts), (device, ts) y
+    (status, ts): el costo depende del tamaño de la página, no de la tabla.
+    """
+
+    def __init__(self, cfg: EventStoreConfig = EventStoreConfig()) -> None:
+        self._cfg = cfg
+        Path(cfg.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+        self._queue: "queue.Queue[Optional[Tuple[Any, ...]]]" = queue.Queue(maxsize=cfg.queue_size)
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._run, name="event-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._cfg.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Con WAL, NORMAL solo arriesga la última transacción ante un corte de energía
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def append(
+        self,
+        result: Dict[str, Any],
+        source: str,
+        device: Optional[str] = None,
+        ts: Optional[float] = None,
+    ) -> bool:
+        """Encola un resultado (asdict de InferenceResult). False si se descartó."""
+        meta = result.get("meta") or {}
+        row = (
+            ts if ts is not None else time.time(),
+            source,
+            device,
+            meta.get("image_blob"),
+            result["status"],
+            result["final_score"],
+            result.get("image_probability"),
+            result.get("audio_probability"),
+            meta.get("model_version"),
+            meta.get("cache"),
+            json.dumps(meta["timings_ms"]) if meta.get("timings_ms") else None,
+        )
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            EVENTS_DROPPED.inc()
+            return False
+
+    def flush(self) -> None:
+        """Espera a que todo lo encolado hasta ahora esté escrito."""
+        done = threading.Event()
+        self._queue.put(("__flush__", done))
+        done.wait()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join()
+        self._db.close()
+
+    def _run(self) -> None:
+        insert = f"INSERT INTO events ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self._cfg.flush_interval_s
+            while batch[-1] is not None and len(batch) < self._cfg.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            rows = [r for r in batch if r is not None and r[0] != "__flush__"]
+            if rows:
+                try:
+                    with self._db:
+                        self._db.executemany(insert, rows)
+                except sqlite3.Error:
+                    logger.exception("Error escribiendo %d eventos", len(rows))
+
+            for r in batch:
+                if r is not None and r[0] == "__flush__":
+                    r[1].set()
+            if batch[-1] is None:
+                return
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+            db.row_factory = sqlite3.Row
+        return db
+
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        device: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Eventos del más reciente al más antiguo. Retorna (eventos,
+        siguiente_cursor); el cursor es None en la última página.
+        """
+        where, params = [], []
+        if device is not None:
+            where.append("device = ?")
+            params.append(device)
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        if cursor:
+            ts, row_id = _decode_cursor(cursor)
+            where.append("(ts, id) < (?, ?)")
+            params.extend([ts, row_id])
+
+        sql = "SELECT * FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        events = []
+        for row in rows[:limit]:
+            event = dict(row)
+            timings = event.pop("timings")
+            event["timings_ms"] = json.loads(timings) if timings else None
+            events.append(event)
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = events[-1]
+            next_cursor = f"{last['ts']!r}_{last['id']}"
+        return events, next_cursor
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        ts, row_id = cursor.rsplit("_", 1)
+        return float(ts), int(row_id)
+    except ValueError:
+        raise ValueError(f"Cursor inválido: {cursor}") from None
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import io
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
+from app.blob_index import BlobInfo
+from app.metrics import timed
+
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 from google.oauth2 import service_account
 
@@ -26,6 +33,7 @@ class GCSClient:
         creds = service_account.Credentials.from_service_account_file(str(sa_path))
         self._client = storage.Client(credentials=creds, project=creds.project_id)
         self._bucket = self._client.bucket(cfg.bucket_name)
+        self._local = threading.local()
 
     def download_blob_to_path(self, blob_name: str, out_path: str) -> str:
         out = Path(out_path)
@@ -38,16 +46,74 @@ class GCSClient:
         blob.download_to_filename(str(out))
         return str(out)
 
-    def find_latest_blob(self, prefix: str):
-        blobs = list(self._client.list_blobs(self._bucket, prefix=prefix))
+    def get_blob(self, blob_name: str) -> storage.Blob:
+        """
+        Obtiene los metadatos del blob (generation, etag, size) en una sola
+        llamada. El objeto retornado queda fijado a esa generación.
+        """
+        blob = self._bucket.get_blob(blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"Blob no existe en bucket: {blob_name}")
+        return blob
+
+    def download_blob(self, blob: storage.Blob, out_path: str) -> str:
+        out = Path(out_path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with timed("download"):
+            blob.download_to_filename(str(out))
+        return str(out)
 
-        print("DEBUG - blobs encontrados:")
+    def download_blob_bytes(self, blob_name: str) -> bytes:
+        try:
+            with timed("download"):
+                return self._bucket.blob(blob_name).download_as_bytes()
+        except NotFound:
+            raise FileNotFoundError(f"Blob no existe en bucket: {blob_name}") from None
+
+    @contextmanager
+    def open_blob_bytes(self, blob_name: str) -> Iterator[memoryview]:
+        """
+        Descarga el blob a memoria, en un buffer reutilizable por hilo, sin
+        pasar por disco. La vista solo es válida dentro del bloque `with`.
+        """
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = io.BytesIO()
+        buf.seek(0)
+        buf.truncate()
+
+        try:
+            with timed("download"):
+                self._bucket.blob(blob_name).download_to_file(buf)
+        except NotFound:
+            raise FileNotFoundError(f"Blob no existe en bucket: {blob_name}") from None
+
+        view = buf.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+
+    def list_blob_infos(self, prefix: str, start_offset: Optional[str] = None) -> Iterator[BlobInfo]:
+        """
+        Lista (nombre, generation, updated) de los blobs del prefijo, en orden
+        lexicográfico y desde `start_offset` si se indica. Solo pide esos campos.
+        """
+        blobs = self._client.list_blobs(
+            self._bucket,
+            prefix=prefix,
+            start_offset=start_offset,
+            fields="items(name,generation,updated),nextPageToken",
+        )
         for b in blobs:
-            print(" -", b.name)
+            updated = b.updated.timestamp() if b.updated else 0.0
+            yield BlobInfo(name=b.name, generation=int(b.generation or 0), updated=updated)
+
+    def find_latest_blob(self, prefix: str):
+        blobs = list(self._client.list_blobs(self._bucket, prefix=prefix))
 
         if not blobs:
             return None
 
         blobs.sort(key=lambda b: b.updated or 0, reverse=True)
         return blobs[0].name
-
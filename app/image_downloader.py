@@ -1,7 +1,10 @@
 from pathlib import Path
 from typing import Optional
 
-from app.gcs_client import GCSClient, GCSConfig
+from app.blob_cache import BlobCache, BlobCacheConfig
+from app.image_store import ImageRetentionConfig, ImageStore
+from app.singleflight import SingleFlight
+from app.storage import make_storage
 from app.settings import settings
 
 
@@ -9,30 +12,46 @@ class ImageDownloader:
     """
     Descarga imágenes desde Google Cloud Storage
     y las guarda localmente de forma persistente.
+
+    La descarga pasa por la BlobCache: si se le pasa la misma caché que usa
+    InferenceService, la inferencia posterior reutiliza el archivo sin volver
+    a ir a GCS.
+
+    Los archivos se guardan en un ImageStore (directorios por shard y
+    retención acotada en segundo plano, ver DOWNLOAD_* en settings).
     """
 
-    def __init__(self, output_dir: str = "downloaded_images"):
+    def __init__(self, output_dir: str = "downloaded_images", cache: Optional[BlobCache] = None):
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-
-        self.gcs = GCSClient(
-            GCSConfig(
-                sa_json_path=settings.GCS_SA_JSON,
-                bucket_name=settings.GCS_BUCKET,
+        self.store = ImageStore(ImageRetentionConfig(
+            root=output_dir,
+            max_bytes=settings.DOWNLOAD_MAX_BYTES,
+            max_files=settings.DOWNLOAD_MAX_FILES,
+            max_age_s=settings.DOWNLOAD_MAX_AGE_S,
+            interval_s=settings.DOWNLOAD_RETENTION_INTERVAL_S,
+        ))
+        self.store.start()
+        self._inflight = SingleFlight("image_download")
+
+        if cache is None:
+            cache = BlobCache(
+                make_storage(),
+                BlobCacheConfig(
+                    cache_dir=settings.BLOB_CACHE_DIR,
+                    max_bytes=settings.BLOB_CACHE_MAX_BYTES,
+                    identity_ttl_s=settings.BLOB_CACHE_IDENTITY_TTL_S,
+                ),
             )
-        )
+        self.cache = cache
+        self.storage = cache.storage
 
     def download(self, image_blob: str) -> Path:
         """
         Descarga un blob de imagen desde GCS y lo guarda localmente.
-        Retorna la ruta local del archivo.
+        Retorna la ruta local del archivo. Si el mismo blob ya se está
+        descargando, espera esa descarga en vez de escribir el archivo dos veces.
         """
-        filename = Path(image_blob).name
-        local_path = self.output_dir / filename
-
-        self.gcs.download_blob_to_path(
-            blob_name=image_blob,
-            out_path=str(local_path),
-        )
+        return self._inflight.do(image_blob, self._download, image_blob)[0]
 
-        return local_path
+    def _download(self, image_blob: str) -> Path:
+        return self.store.put(image_blob, self.cache.fetch(image_blob))
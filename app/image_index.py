@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+@dataclass(frozen=True)
+class ImageRecord:
+    name: str  # ruta relativa al directorio de imágenes
+    mtime_ns: int
+    size: int
+    width: int
+    height: int
+    format: str
+
+
+class ImageIndex:
+    """
+    Índice incremental de un directorio de imágenes para el dashboard.
+
+    - Metadatos (tamaño, dimensiones, formato, mtime) en SQLite: se leen una
+      sola vez por archivo (solo la cabecera) y sobreviven reinicios.
+    - `refresh` solo vuelve a listar los directorios cuyo mtime cambió; si
+      nada cambió no toca el disco más que con un stat por directorio.
+    - Miniaturas persistentes en `cache_dir/thumbs`, generadas al pedirlas
+      (JPEG en modo draft) y con escritura atómica. Se registran en SQLite y
+      `refresh` borra las de imágenes eliminadas o modificadas.
+    """
+
+    def __init__(self, image_dir: str, cache_dir: str = ".dashboard_cache") -> None:
+        self.image_dir = Path(image_dir)
+        self._cache_dir = Path(cache_dir)
+        self._thumb_dir = self._cache_dir / "thumbs"
+        self._thumb_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self._cache_dir / "images.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        if self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'thumbs'").fetchone() is None:
+            # Miniaturas de versiones sin registro: no hay forma de saber de quién son
+            shutil.rmtree(self._thumb_dir, ignore_errors=True)
+            self._thumb_dir.mkdir(parents=True, exist_ok=True)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                format TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS images_mtime ON images (mtime_ns);
+            CREATE TABLE IF NOT EXISTS thumbs (
+                file TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thumbs_name ON thumbs (name);
+        """)
+        # nombre -> mtime_ns de lo ya indexado
+        self._known: Dict[str, int] = dict(self._db.execute("SELECT name, mtime_ns FROM images"))
+        # directorio relativo -> (mtime_ns, archivos de imagen, subdirectorios)
+        self._dirs: Dict[str, Tuple[int, Set[str], List[str]]] = {}
+
+    def _forget_dir(self, rel: str, removed: Set[str]) -> None:
+        cached = self._dirs.pop(rel, None)
+        if cached is not None:
+            removed.update(cached[1])
+            for sub in cached[2]:
+                self._forget_dir(sub, removed)
+
+    def refresh(self) -> int:
+        """Sincroniza el índice con el disco. Retorna cuántos archivos cambiaron."""
+        with self._lock:
+            first_scan = not self._dirs
+            seen: Set[str] = set()
+            removed: Set[str] = set()
+            changed: List[Tuple[str, os.stat_result]] = []
+
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                path = self.image_dir / rel if rel else self.image_dir
+                cached = self._dirs.get(rel)
+                try:
+                    dir_mtime = path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    self._forget_dir(rel, removed)
+                    continue
+
+                if cached is not None and cached[0] == dir_mtime:
+                    # Crear, borrar o renombrar entradas cambia el mtime del
+                    # directorio: si no cambió, su listado tampoco.
+                    stack.extend(cached[2])
+                    continue
+
+                files, subdirs = set(), []
+                with os.scandir(path) as it:
+                    for entry in it:
+                        name = f"{rel}/{entry.name}" if rel else entry.name
+                        if entry.is_dir():
+                            subdirs.append(name)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS) and not entry.name.startswith("."):
+                            files.add(name)
+                            st = entry.stat()
+                            if self._known.get(name) != st.st_mtime_ns:
+                                changed.append((name, st))
+
+                if cached is not None:
+                    removed.update(cached[1] - files)
+                    for sub in set(cached[2]) - set(subdirs):
+                        self._forget_dir(sub, removed)
+                self._dirs[rel] = (dir_mtime, files, subdirs)
+                seen.update(files)
+                stack.extend(subdirs)
+
+            if first_scan:
+                # Lo indexado en corridas anteriores que ya no existe
+                removed.update(name for name in self._known if name not in seen)
+
+            rows = []
+            for name, st in changed:
+                meta = self._read_header(self.image_dir / name)
+                if meta is not None:
+                    rows.append((name, st.st_mtime_ns, st.st_size) + meta)
+
+            # Miniaturas de otra versión del archivo (o de uno que ya no existe)
+            stale: List[str] = []
+            for name, mtime_ns in [(n, st.st_mtime_ns) for n, st in changed] + [(n, -1) for n in removed]:
+                stale.extend(f for (f,) in self._db.execute(
+                    "SELECT file FROM thumbs WHERE name = ? AND mtime_ns != ?", (name, mtime_ns)))
+
+            if rows or removed or stale:
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    self._db.executemany("DELETE FROM images WHERE name = ?", [(n,) for n in removed])
+                    self._db.executemany("DELETE FROM thumbs WHERE file = ?", [(f,) for f in stale])
+                for row in rows:
+                    self._known[row[0]] = row[1]
+                for name in removed:
+                    self._known.pop(name, None)
+                for f in stale:
+                    (self._thumb_dir / f).unlink(missing_ok=True)
+            return len(rows) + len(removed)
+
+    @staticmethod
+    def _read_header(path: Path) -> Optional[Tuple[int, int, str]]:
+        # Image.open solo lee la cabecera; los píxeles no se decodifican
+        try:
+            with Image.open(path) as img:
+                return img.width, img.height, img.format or path.suffix[1:].upper()
+        except (OSError, SyntaxError):
+            return None
+
+    def count(self) -> int:
+        return len(self._known)
+
+    def page(self, page: int, per_page: int) -> List[ImageRecord]:
+        """Página `page` (desde 0), de la imagen más reciente a la más antigua."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM images ORDER BY mtime_ns DESC, name LIMIT ? OFFSET ?",
+                (per_page, page * per_page),
+            ).fetchall()
+        return [ImageRecord(*row) for row in rows]
+
+    def get(self, name: str) -> Optional[ImageRecord]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM images WHERE name = ?", (name,)).fetchone()
+        return ImageRecord(*row) if row else None
+
+    def thumbnail(self, record: ImageRecord, size: Tuple[int, int] = (500, 350)) -> Path:
+        """Ruta de la miniatura (JPEG) de `record`; se genera solo la primera vez."""
+        key = hashlib.sha1(f"{record.name}#{record.mtime_ns}#{size}".encode("utf-8")).hexdigest()
+        rel = f"{key[:2]}/{key}.jpg"
+        out = self._thumb_dir / rel
+        if out.exists():
+            return out
+
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(self.image_dir / record.name) as img:
+            # draft: el JPEG se decodifica directamente a una escala reducida
+            img.draft("RGB", size)
+            img = img.convert("RGB")
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            tmp = out.with_name(f"{key}.part-{threading.get_ident()}")
+            img.save(tmp, "JPEG", quality=85)
+        os.replace(tmp, out)
+        # Registrada con el mtime de `record`: la borra el `refresh` que vea
+        # el archivo modificado o eliminado
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO thumbs VALUES (?, ?, ?)", (rel, record.name, record.mtime_ns))
+        return out
@@ -1,21 +1,68 @@
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import torch
 import torch.nn as nn
-from PIL import Image
 import timm
 from torchvision import transforms
 
+from app.metrics import BATCH_SIZE, observe, timed
+from app.preprocess import FastPreprocessor, ImageSource, load_image, IMAGENET_MEAN, IMAGENET_STD
+
+# Backends de ejecución soportados (todos detrás de la misma API predict_proba*)
+BACKENDS = ("torch-eager", "torchscript", "onnxruntime", "torch-int8")
+
+
+def pick_quantized_engine() -> str:
+    """Motor de kernels INT8 de torch: x86/fbgemm en Intel/AMD, qnnpack en ARM."""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            return engine
+    raise RuntimeError("Este build de torch no soporta modelos cuantizados")
+
 
 @dataclass(frozen=True)
 class ImageModelConfig:
     weights_path: str
     device: str = "cpu"
+    num_threads: int = 0  # 0 = dejar el valor por defecto de torch
+    # torch-eager: state_dict (.pt) | torchscript: módulo jit | onnxruntime: .onnx
+    # torch-int8: módulo jit cuantizado por scripts/quantize_model.py
+    backend: str = "torch-eager"
+    # False = Resize/ToTensor/Normalize de torchvision (ruta original)
+    fast_preprocess: bool = True
+
+
+def build_eager_model(weights_path: str, shared_state: Optional[Dict[str, torch.Tensor]] = None) -> nn.Module:
+    """
+    EfficientNet-B0 eager con los pesos de train_image.py, en modo eval.
+    Con `shared_state` los parámetros referencian esos tensores (sin copia),
+    p. ej. los de memoria compartida del pool de procesos.
+    """
+    # Arquitectura consistente con train_image.py
+    model = timm.create_model("efficientnet_b0", pretrained=False, num_classes=1)
+    if shared_state is not None:
+        model.load_state_dict(shared_state, assign=True)
+    else:
+        state = torch.load(str(weights_path), map_location="cpu")
+        model.load_state_dict(state)
+    model.eval()
+    return model
+
+
+def build_preprocess() -> transforms.Compose:
+    """Mismo preprocesamiento que la validación de train_image.py."""
+    return transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD),
+    ])
 
 
 class FireImageClassifier:
@@ -23,39 +70,151 @@ class FireImageClassifier:
     Modelo binario FIRE vs NO_FIRE.
     Output: probabilidad de FIRE (0..1)
     """
-    def __init__(self, cfg: ImageModelConfig) -> None:
+    def __init__(
+        self,
+        cfg: ImageModelConfig,
+        shared_state: Optional[Dict[str, torch.Tensor]] = None,
+        weights_hash: Optional[str] = None,
+    ) -> None:
+        if cfg.backend not in BACKENDS:
+            raise ValueError(f"Backend de modelo desconocido: {cfg.backend}. Opciones: {', '.join(BACKENDS)}")
+
         self.device = torch.device(cfg.device)
+        self.backend = cfg.backend
 
-        # Arquitectura consistente con train_image.py
-        self.model = timm.create_model("efficientnet_b0", pretrained=False, num_classes=1)
-        self.model.eval()
-        self.model.to(self.device)
+        if cfg.num_threads > 0:
+            torch.set_num_threads(cfg.num_threads)
 
         wpath = Path(cfg.weights_path)
         if not wpath.exists():
             raise FileNotFoundError(
                 f"No se encontraron pesos de modelo en {wpath}. "
-                "Entrena con scripts/train_image.py o coloca el .pt."
+                "Entrena con scripts/train_image.py o coloca el .pt "
+                "(para torchscript/onnxruntime: python -m scripts.export_model)."
             )
 
-        state = torch.load(str(wpath), map_location="cpu")
-        self.model.load_state_dict(state)
+        # Identifica la versión del modelo (claves de caché, meta de resultados)
+        self.weights_hash = weights_hash or hashlib.sha256(wpath.read_bytes()).hexdigest()[:16]
+
+        if cfg.backend == "torch-eager":
+            self.model = build_eager_model(str(wpath), shared_state).to(self.device, memory_format=torch.channels_last)
+            self._forward = self.model
+        elif cfg.backend in ("torchscript", "torch-int8"):
+            if cfg.backend == "torch-int8":
+                # Los kernels INT8 solo corren en CPU
+                self.device = torch.device("cpu")
+                torch.backends.quantized.engine = pick_quantized_engine()
+            self.model = torch.jit.load(str(wpath), map_location=self.device)
+            self.model.eval()
+            self._forward = self.model
+        else:
+            self.model = None
+            self._forward = self._load_onnxruntime(wpath, cfg.num_threads)
 
-        self.preprocess = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=(0.485, 0.456, 0.406),
-                std=(0.229, 0.224, 0.225),
-            ),
-        ])
+        self.fast_preprocess = cfg.fast_preprocess
+        self.preprocess = build_preprocess()
+        self.preprocessor = FastPreprocessor(size=224)
 
         self.sigmoid = nn.Sigmoid()
 
+    def share_memory(self) -> Optional[Dict[str, torch.Tensor]]:
+        """
+        Mueve los pesos eager a memoria compartida y retorna su state_dict,
+        para que otros procesos los usen sin copiarlos. None si el backend
+        no es torch-eager (cada proceso carga entonces su propio artefacto).
+        """
+        if self.backend != "torch-eager" or self.device.type != "cpu":
+            return None
+        self.model.share_memory()
+        return self.model.state_dict()
+
+    def _load_onnxruntime(self, wpath: Path, num_threads: int):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError(
+                "IMAGE_MODEL_BACKEND=onnxruntime requiere el paquete 'onnxruntime'"
+            ) from e
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            opts.intra_op_num_threads = num_threads
+
+        providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] \
+            if self.device.type == "cuda" else ["CPUExecutionProvider"]
+        session = ort.InferenceSession(str(wpath), sess_options=opts, providers=providers)
+        input_name = session.get_inputs()[0].name
+
+        def forward(x: torch.Tensor) -> torch.Tensor:
+            # ORT espera NCHW contiguo (la entrada puede venir channels_last)
+            out = session.run(None, {input_name: np.ascontiguousarray(x.cpu().numpy())})[0]
+            return torch.from_numpy(out)
+
+        return forward
+
+    def _to_batch(self, imgs: Sequence[ImageSource]) -> Tuple[Optional[torch.Tensor], Dict[int, Exception]]:
+        """
+        Tensor [B',3,224,224] con las imágenes que se pudieron decodificar y
+        el error de las demás por índice (None si ninguna se decodificó).
+        """
+        errors: Dict[int, Exception] = {}
+        if self.fast_preprocess:
+            arrays = []
+            for i, src in enumerate(imgs):
+                try:
+                    arrays.append(self.preprocessor.decode_array(src))
+                except Exception as e:
+                    errors[i] = e
+            x = self.preprocessor(arrays) if arrays else None
+        else:
+            tensors = []
+            for i, src in enumerate(imgs):
+                try:
+                    with timed("decode"):
+                        img = load_image(src)
+                    with timed("preprocess"):
+                        tensors.append(self.preprocess(img))
+                except Exception as e:
+                    errors[i] = e
+            x = torch.stack(tensors) if tensors else None
+        return (x.to(self.device) if x is not None else None), errors
+
+    @torch.no_grad()
+    def predict_proba(self, img: ImageSource) -> float:
+        prob = self.predict_proba_each([img])[0]
+        if isinstance(prob, Exception):
+            raise prob
+        return prob
+
     @torch.no_grad()
-    def predict_proba(self, img_path: str) -> float:
-        img = Image.open(img_path).convert("RGB")
-        x = self.preprocess(img).unsqueeze(0).to(self.device)  # [1,3,224,224]
-        logits = self.model(x)  # [1,1]
-        prob = self.sigmoid(logits).item()
-        return float(prob)
+    def predict_proba_batch(self, imgs: Sequence[ImageSource]) -> List[float]:
+        """
+        Igual que predict_proba pero con un único forward para todo el lote.
+        Retorna una probabilidad por imagen, en el mismo orden.
+        """
+        probs = self.predict_proba_each(imgs)
+        for p in probs:
+            if isinstance(p, Exception):
+                raise p
+        return probs
+
+    @torch.no_grad()
+    def predict_proba_each(self, imgs: Sequence[ImageSource]) -> List[Union[float, Exception]]:
+        """
+        Como predict_proba_batch, pero una imagen que no se puede decodificar
+        no hace fallar al lote: en su lugar va la excepción y el forward
+        corre con las demás.
+        """
+        if not imgs:
+            return []
+
+        x, errors = self._to_batch(imgs)
+        probs: List[float] = []
+        if x is not None:
+            with timed("forward"):
+                logits = self._forward(x)  # [B',1]
+            observe(BATCH_SIZE, x.shape[0])
+            probs = [float(p) for p in self.sigmoid(logits).reshape(-1).tolist()]
+        it = iter(probs)
+        return [errors[i] if i in errors else next(it) for i in range(len(imgs))]
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import List, Optional, Tuple
+
+from app.metrics import Counter
+
+logger = logging.getLogger("iot-fire-ai")
+
+IMAGES_EVICTED = Counter(
+    "fire_downloaded_images_evicted_total",
+    "Imágenes descargadas borradas por la política de retención",
+    ("reason",),
+)
+
+
+@dataclass(frozen=True)
+class ImageRetentionConfig:
+    root: str = "downloaded_images"
+    # Límites de retención; 0 = sin límite
+    max_bytes: int = 10 << 30
+    max_files: int = 200_000
+    max_age_s: float = 7 * 24 * 3600.0
+    interval_s: float = 30.0
+    # Borrados como máximo por pasada: el desalojo avanza de a poco y no
+    # retiene el lock durante ráfagas largas.
+    evict_batch: int = 1000
+
+
+def _shard(blob_name: str) -> str:
+    return hashlib.sha1(blob_name.encode("utf-8")).hexdigest()[:2]
+
+
+def _is_shard(part: str) -> bool:
+    return len(part) == 2 and all(c in "0123456789abcdef" for c in part)
+
+
+def blob_name_from_path(rel: str) -> str:
+    """
+    Nombre del blob de una imagen a partir de su ruta relativa a la raíz
+    ("3f/images/cam1/frame.jpg" -> "images/cam1/frame.jpg"). Los archivos
+    del formato plano anterior se devuelven tal cual.
+    """
+    shard, sep, blob = rel.partition("/")
+    return blob if sep and _is_shard(shard) else rel
+
+
+class ImageStore:
+    """
+    Imágenes descargadas por el pipeline MQTT, en `root/<shard>/<blob>`:
+
+    - el shard (2 hex del sha1 del nombre) reparte los archivos en 256
+      directorios y el blob conserva su ruta completa, así dos blobs con el
+      mismo nombre bajo prefijos distintos no se pisan;
+    - escrituras atómicas (temp + rename): el dashboard nunca ve un archivo
+      a medias;
+    - retención en segundo plano por bytes, cantidad y antigüedad con
+      desalojo LRU (uso = última vez que se guardó el blob). Al arrancar,
+      lo que ya hay en disco se indexa en el mismo hilo, sin bloquear `put`.
+    """
+
+    def __init__(self, cfg: ImageRetentionConfig = ImageRetentionConfig()) -> None:
+        self._cfg = cfg
+        self.root = Path(cfg.root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # ruta relativa -> (bytes, último uso epoch); LRU al inicio
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._scanned = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def files(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def path_for(self, blob_name: str) -> Path:
+        # Sin "..", "/" inicial ni componentes vacíos: el nombre llega por MQTT
+        parts = [p for p in PurePosixPath(blob_name).parts if p not in ("/", ".", "..")]
+        if not parts:
+            raise ValueError(f"Nombre de blob inválido: {blob_name!r}")
+        return self.root / _shard(blob_name) / Path(*parts)
+
+    def put(self, blob_name: str, src: Path) -> Path:
+        """Guarda `src` como la imagen de `blob_name` (hard link si se puede)."""
+        path = self.path_for(blob_name)
+        tmp = path.with_name(f".{path.name}.part-{threading.get_ident()}")
+        for attempt in range(2):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self._link_or_copy(src, tmp)
+                break
+            except FileNotFoundError:
+                # `enforce` pudo borrar el directorio recién vaciado entre
+                # mkdir y la escritura: se crea de nuevo una vez
+                if attempt:
+                    raise
+        os.replace(tmp, path)
+
+        rel = path.relative_to(self.root).as_posix()
+        size = path.stat().st_size
+        with self._lock:
+            old = self._entries.pop(rel, None)
+            if old is not None:
+                self._total_bytes -= old[0]
+            self._entries[rel] = (size, time.time())
+            self._total_bytes += size
+        return path
+
+    @staticmethod
+    def _link_or_copy(src: Path, dst: Path) -> None:
+        try:
+            os.link(src, dst)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(src, dst)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="image-retention", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            self._scan()
+        except OSError:
+            logger.exception("Error indexando %s", self.root)
+        while not self._stop.is_set():
+            evicted = self.enforce()
+            # Lote completo: probablemente sigue excedido, se continúa enseguida
+            if evicted < self._cfg.evict_batch:
+                self._stop.wait(self._cfg.interval_s)
+
+    def _scan(self) -> None:
+        found: List[Tuple[str, int, float]] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            if self._stop.is_set():
+                return
+            rel_dir = Path(dirpath).relative_to(self.root).as_posix()
+            for fn in filenames:
+                if ".part-" in fn:
+                    continue
+                try:
+                    st = os.stat(os.path.join(dirpath, fn))
+                except FileNotFoundError:
+                    continue
+                found.append((fn if rel_dir == "." else f"{rel_dir}/{fn}", st.st_size, st.st_mtime))
+
+        found.sort(key=lambda e: e[2])
+        with self._lock:
+            # Lo guardado con `put` durante el escaneo queda como lo más reciente
+            entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict(
+                (rel, (size, mtime)) for rel, size, mtime in found if rel not in self._entries
+            )
+            entries.update(self._entries)
+            self._entries = entries
+            self._total_bytes = sum(size for size, _ in entries.values())
+            self._scanned = True
+        logger.info("🗂️ %d imágenes descargadas indexadas (%d bytes)", len(self._entries), self._total_bytes)
+
+    def _over_limit(self, ts: float, now: float) -> Optional[str]:
+        cfg = self._cfg
+        if cfg.max_age_s and now - ts > cfg.max_age_s:
+            return "age"
+        if cfg.max_files and len(self._entries) > cfg.max_files:
+            return "files"
+        if cfg.max_bytes and self._total_bytes > cfg.max_bytes:
+            return "bytes"
+        return None
+
+    def _prune_dirs(self, rel: str) -> None:
+        # Directorios vaciados por el borrado, hasta el shard (que se conserva)
+        parent = PurePosixPath(rel).parent
+        while len(parent.parts) > 1:
+            try:
+                (self.root / parent).rmdir()
+            except OSError:  # no vacío o ya borrado
+                return
+            parent = parent.parent
+
+    def enforce(self) -> int:
+        """Una pasada de retención (hasta `evict_batch` borrados). Retorna cuántos borró."""
+        if not self._scanned:
+            return 0
+        now = time.time()
+        evicted = 0
+        while evicted < self._cfg.evict_batch:
+            with self._lock:
+                if not self._entries:
+                    break
+                rel, (size, ts) = next(iter(self._entries.items()))
+                reason = self._over_limit(ts, now)
+                if reason is None:
+                    break
+                del self._entries[rel]
+                self._total_bytes -= size
+                # Dentro del lock: un `put` concurrente del mismo blob no se pierde
+                try:
+                    (self.root / rel).unlink()
+                except FileNotFoundError:
+                    pass
+                self._prune_dirs(rel)
+            IMAGES_EVICTED.inc(reason)
+            evicted += 1
+        return evicted
@@ -1,13 +1,50 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import logging
 import os
-import tempfile
-from dataclasses import dataclass
-from typing import Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, List, Sequence, Tuple, Union
 
 from .settings import settings
-from .gcs_client import GCSClient, GCSConfig
-from .image_model import FireImageClassifier, ImageModelConfig
+from .batching import BatchingConfig, BatchingEngine
+from .blob_index import LatestBlobIndex
+from .metrics import timed
+from .event_store import EventStore, EventStoreConfig
+from .result_cache import ResultCache, ResultCacheConfig
+from .singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from .image_model import ImageModelConfig
+    from .storage import StorageBackend
+    from .preprocess import ImageSource
+
+logger = logging.getLogger("iot-fire-ai")
+
+
+class _Laps:
+    """
+    Duración (ms) de cada fase de una petición; va en meta.timings_ms.
+    `on_lap(fase, ms)` se llama al cerrar cada fase (progreso en vivo).
+    """
+
+    def __init__(self, on_lap: Optional[Callable[[str, float], None]] = None) -> None:
+        self.ms: Dict[str, float] = {}
+        self._on_lap = on_lap
+        self._t = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.ms[phase] = round((now - self._t) * 1000, 2)
+        self._t = now
+        if self._on_lap is not None:
+            self._on_lap(phase, self.ms[phase])
 
 
 @dataclass
@@ -20,17 +57,266 @@ class InferenceResult:
 
 
 class InferenceService:
-    def __init__(self) -> None:
-        # GCS client (opcional según uso)
-        self.gcs = GCSClient(GCSConfig(sa_json_path=settings.GCS_SA_JSON, bucket_name=settings.GCS_BUCKET))
+    """
+    Servicio de inferencia con arranque diferido.
+
+    Construirlo es barato: torch/timm, los pesos y el backend de blobs se cargan en
+    `ensure_loaded()` (la primera predicción o `start_background()` en el
+    startup de la API). `ready` solo es True cuando el modelo está cargado y
+    ya corrió un forward de calentamiento.
+    """
+
+    def __init__(self, storage: Optional[StorageBackend] = None) -> None:
+        # Backend de blobs ya construido; si es None se crea en _load según
+        # STORAGE_BACKEND.
+        self._storage = storage
+        self._load_lock = threading.Lock()
+        self._event_store: Optional[EventStore] = None
+        self._event_store_lock = threading.Lock()
+        # Peticiones simultáneas por el mismo blob (dashboard, re-entrega MQTT,
+        # /predict/batch) comparten una sola descarga y un solo forward.
+        self._inflight = SingleFlight("inference")
+        self._loaded = threading.Event()
+        self.warmed = False
+        self.startup_error: Optional[str] = None
+        # Falla de _load: no se reintenta en cada petición (requiere reinicio)
+        self._load_error: Optional[Exception] = None
+        # Duración de cada fase del arranque (ms), expuesta en /ready
+        self.startup_timings: Dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded.is_set() and self.warmed
+
+    @contextmanager
+    def _timed(self, phase: str):
+        t0 = time.perf_counter()
+        yield
+        self.startup_timings[phase] = round((time.perf_counter() - t0) * 1000, 1)
+        logger.info("⏱️ Arranque: %s en %.1f ms", phase, self.startup_timings[phase])
+
+    def start_background(self) -> None:
+        """Carga y calienta el modelo en un hilo, sin bloquear el startup."""
+        threading.Thread(target=self._startup, name="inference-startup", daemon=True).start()
+
+    def _startup(self) -> None:
+        try:
+            self.ensure_loaded()
+            if settings.WARMUP_ON_STARTUP:
+                self.warmup()
+            else:
+                self.warmed = True
+        except Exception as e:
+            self.startup_error = self.startup_error or f"{type(e).__name__}: {e}"
+            logger.exception("Error cargando el servicio de inferencia")
+
+    def ensure_loaded(self) -> None:
+        if self._loaded.is_set():
+            return
+        with self._load_lock:
+            if self._loaded.is_set():
+                return
+            if self._load_error is not None:
+                raise RuntimeError(f"El servicio de inferencia no cargó: {self.startup_error}") from self._load_error
+            try:
+                self._load()
+            except Exception as e:
+                self._load_error = e
+                self.startup_error = f"{type(e).__name__}: {e}"
+                raise
+            self._loaded.set()
+
+    def _load(self) -> None:
+        # El modelo primero: si falla no queda ningún hilo ni cliente creado
+        with self._timed("import_torch"):
+            from .image_model import FireImageClassifier
+
+        with self._timed("model_load"):
+            self.img_model = FireImageClassifier(self._model_config())
+
+        # Imports pesados (google-cloud) diferidos hasta aquí
+        with self._timed("import_storage"):
+            from .storage import make_storage
+            from .blob_cache import BlobCache, BlobCacheConfig
+
+        with self._timed("storage"):
+            # GCS o directorio local, según STORAGE_BACKEND
+            self.storage = self._storage or make_storage()
+
+            # Caché de blobs compartida con ImageDownloader (ver mqtt_listener)
+            self.blob_cache = BlobCache(self.storage, BlobCacheConfig(
+                cache_dir=settings.BLOB_CACHE_DIR,
+                max_bytes=settings.BLOB_CACHE_MAX_BYTES,
+                identity_ttl_s=settings.BLOB_CACHE_IDENTITY_TTL_S,
+            ))
+
+            # Índice incremental de los blobs más recientes del prefijo de imágenes
+            self.latest_index = LatestBlobIndex(
+                self.storage.list_blob_infos,
+                prefix=settings.GCS_IMAGE_PREFIX,
+                state_path=settings.LATEST_INDEX_PATH,
+                refresh_s=settings.LATEST_INDEX_REFRESH_S,
+                full_rescan_s=settings.LATEST_INDEX_FULL_RESCAN_S,
+            )
+
+        # Resultados ya calculados (dashboard re-posteando, re-entregas MQTT)
+        self.result_cache = ResultCache(ResultCacheConfig(
+            max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+            ttl_s=settings.RESULT_CACHE_TTL_S,
+            disk_path=settings.RESULT_CACHE_DB,
+            max_disk_entries=settings.RESULT_CACHE_DB_MAX_ENTRIES,
+            prune_interval_s=settings.RESULT_CACHE_PRUNE_S,
+        ))
+
+        # Todas las predicciones (REST y MQTT) pasan por el mismo batcher.
+        # _predict_batch lee self.img_model en cada lote: así un hot-reload
+        # surte efecto en el lote siguiente y el lote en curso termina con
+        # el modelo anterior.
+        if settings.INFERENCE_WORKERS > 0:
+            from .process_pool import ProcessInferencePool, ProcessPoolConfig
+
+            # Mismo contrato (submit -> Future de (prob, versión)), pero el
+            # decode y el forward corren en procesos que comparten los pesos.
+            with self._timed("inference_workers"):
+                self.batcher = ProcessInferencePool(self.img_model, self._model_config(), ProcessPoolConfig(
+                    workers=settings.INFERENCE_WORKERS,
+                    threads_per_worker=settings.INFERENCE_THREADS_PER_WORKER,
+                    max_batch_size=settings.BATCH_MAX_SIZE,
+                    slots=settings.INFERENCE_SLOTS,
+                    slot_bytes=settings.INFERENCE_SLOT_BYTES,
+                    result_timeout_s=settings.INFERENCE_RESULT_TIMEOUT_S,
+                ))
+        else:
+            self.batcher = BatchingEngine(
+                self._predict_batch,
+                BatchingConfig(
+                    max_batch_size=settings.BATCH_MAX_SIZE,
+                    max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+                ),
+            )
+
+        # Pool acotado para E/S bloqueante de almacenamiento (ruta async de /predict)
+        self.io_pool = ThreadPoolExecutor(max_workers=settings.IO_POOL_WORKERS, thread_name_prefix="gcs-io")
+
+        # Hilos de fondo al final, cuando todo lo anterior ya cargó
+        self._reload_lock = threading.Lock()
+        if settings.MODEL_RELOAD_POLL_S > 0:
+            # Recarga del modelo si cambia el archivo de pesos
+            threading.Thread(target=self._watch_weights, name="model-watcher", daemon=True).start()
+        self.latest_index.start()
+
+    def _model_config(self) -> ImageModelConfig:
+        from .image_model import ImageModelConfig
 
         # Device
         device = "cuda" if (os.getenv("CUDA_VISIBLE_DEVICES") not in [None, ""] and self._has_cuda()) else "cpu"
 
-        self.img_model = FireImageClassifier(ImageModelConfig(
-            weights_path=settings.IMAGE_MODEL_PATH,
-            device=device
-        ))
+        weights_path = {
+            "torchscript": settings.IMAGE_MODEL_TS_PATH,
+            "onnxruntime": settings.IMAGE_MODEL_ONNX_PATH,
+            "torch-int8": settings.IMAGE_MODEL_INT8_PATH,
+        }.get(settings.IMAGE_MODEL_BACKEND, settings.IMAGE_MODEL_PATH)
+
+        return ImageModelConfig(
+            weights_path=weights_path,
+            device=device,
+            num_threads=settings.TORCH_NUM_THREADS,
+            backend=settings.IMAGE_MODEL_BACKEND,
+            fast_preprocess=settings.FAST_PREPROCESS,
+        )
+
+    def _predict_batch(self, imgs) -> List[Union[Tuple[float, str], Exception]]:
+        """
+        (probabilidad, versión del modelo que la calculó) por imagen, o la
+        excepción de la imagen que no se pudo decodificar.
+        """
+        model = self.img_model
+        return [p if isinstance(p, Exception) else (p, model.weights_hash)
+                for p in model.predict_proba_each(imgs)]
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.img_model.weights_hash if self._loaded.is_set() else None
+
+    def warmup(self) -> None:
+        """Forward de calentamiento (asignaciones, kernels) antes de recibir tráfico."""
+        import numpy as np
+
+        self.ensure_loaded()
+        with self._timed("warmup"):
+            self.batcher.predict(np.zeros((224, 224, 3), dtype=np.uint8))
+        self.warmed = True
+
+    def reload_model(self) -> str:
+        """
+        Carga los pesos actuales en un modelo nuevo, lo calienta y lo
+        intercambia de forma atómica. Las peticiones en curso terminan con el
+        modelo anterior. Retorna la versión (hash) activa.
+        """
+        import numpy as np
+        from .image_model import FireImageClassifier
+
+        self.ensure_loaded()
+        with self._reload_lock:
+            t0 = time.perf_counter()
+            new_model = FireImageClassifier(self._model_config())
+            if new_model.weights_hash == self.img_model.weights_hash:
+                return new_model.weights_hash
+
+            new_model.predict_proba(np.zeros((224, 224, 3), dtype=np.uint8))
+            old_version = self.img_model.weights_hash
+            if hasattr(self.batcher, "swap_model"):
+                # Pool multiproceso: nueva generación de workers con los pesos nuevos
+                self.batcher.swap_model(new_model, self._model_config())
+            self.img_model = new_model  # asignación atómica
+            logger.info("🔁 Modelo recargado %s -> %s en %.0f ms",
+                        old_version, new_model.weights_hash, (time.perf_counter() - t0) * 1000)
+            return new_model.weights_hash
+
+    def _watch_weights(self) -> None:
+        """Recarga cuando el archivo de pesos cambia y queda estable un intervalo."""
+        path = Path(self._model_config().weights_path)
+
+        def signature():
+            try:
+                st = path.stat()
+                return st.st_mtime_ns, st.st_size
+            except FileNotFoundError:
+                return None
+
+        loaded = signature()
+        previous = loaded
+        while True:
+            time.sleep(settings.MODEL_RELOAD_POLL_S)
+            current = signature()
+            # Se espera a que no cambie entre dos sondeos (escritura terminada)
+            if current is not None and current != loaded and current == previous:
+                try:
+                    self.reload_model()
+                    loaded = current
+                except Exception:
+                    logger.exception("Error recargando el modelo desde %s", path)
+                    loaded = current
+            previous = current
+
+    @property
+    def event_store(self) -> Optional[EventStore]:
+        """Registro de eventos (se abre al primer uso); None si está desactivado."""
+        if self._event_store is None and settings.EVENT_STORE_PATH:
+            with self._event_store_lock:
+                if self._event_store is None:
+                    self._event_store = EventStore(EventStoreConfig(
+                        path=settings.EVENT_STORE_PATH,
+                        batch_size=settings.EVENT_STORE_BATCH_SIZE,
+                        flush_interval_s=settings.EVENT_STORE_FLUSH_S,
+                    ))
+        return self._event_store
+
+    def record_event(self, result: InferenceResult, source: str, device: Optional[str] = None) -> None:
+        """Persiste un resultado puntuado (no bloquea: escritura por lotes)."""
+        store = self.event_store
+        if store is not None:
+            store.append(asdict(result), source=source, device=device)
 
     def _has_cuda(self) -> bool:
         try:
@@ -46,29 +332,69 @@ class InferenceService:
             return "RIESGO"
         return "NORMAL"
 
-    def predict_from_gcs(
+    def _resolve_blob(
         self,
-        image_blob: Optional[str] = None,
-        audio_blob: Optional[str] = None,
-        use_latest_if_missing: bool = True,
-    ) -> InferenceResult:
+        image_blob: Optional[str],
+        audio_blob: Optional[str],
+        use_latest_if_missing: bool,
+    ) -> Tuple[str, str, Optional[InferenceResult]]:
         """
-        Descarga desde GCS y predice.
-        - Si image_blob no viene y use_latest_if_missing=True, toma el último del prefijo images/
+        Resuelve el blob a puntuar y consulta la caché de resultados.
+        Retorna (blob, generación, resultado_cacheado_o_None).
         """
-        with tempfile.TemporaryDirectory() as tmp:
-            # Resolver blob de imagen
-            if not image_blob and use_latest_if_missing:
-                image_blob = self.gcs.find_latest_blob(prefix=settings.GCS_IMAGE_PREFIX)
+        with timed("resolve"):
+            return self._resolve_blob_untimed(image_blob, audio_blob, use_latest_if_missing)
+
+    def _resolve_blob_untimed(
+        self,
+        image_blob: Optional[str],
+        audio_blob: Optional[str],
+        use_latest_if_missing: bool,
+    ) -> Tuple[str, str, Optional[InferenceResult]]:
+        version: Optional[str] = None
+        if not image_blob and use_latest_if_missing:
+            latest = self.latest_index.latest()
+            if latest is not None:
+                image_blob = latest.name
+                version = str(latest.generation)
 
-            if not image_blob:
-                raise ValueError("No se encontró image_blob ni se pudo resolver 'latest' en el bucket.")
+        if not image_blob:
+            raise ValueError("No se encontró image_blob ni se pudo resolver 'latest' en el bucket.")
 
-            local_img = os.path.join(tmp, "image.jpg")
-            self.gcs.download_blob_to_path(image_blob, local_img)
+        if version is None:
+            version = self.blob_cache.cached_version(image_blob)
+        if version is None:
+            blob = self.storage.get_blob(image_blob)
+            version = str(blob.generation or blob.etag)
 
-            img_prob = self.img_model.predict_proba(local_img)
+        cache_key = self._cache_key(image_blob, version, audio_blob, self.img_model.weights_hash)
+        cached, tier = self.result_cache.get(cache_key)
+        if cached is not None:
+            result = InferenceResult(**cached)
+            result.meta = {**result.meta, "cache": tier}
+            return image_blob, version, result
 
+        return image_blob, version, None
+
+    def _cache_key(self, image_blob: str, version: str, audio_blob: Optional[str], model_version: str) -> str:
+        # Mientras no cambie la generación del blob, el modelo ni los umbrales,
+        # el resultado es el mismo (también para "latest").
+        return ResultCache.make_key(
+            image_blob, version, audio_blob, model_version,
+            settings.IMG_THRESHOLD_RISK, settings.IMG_THRESHOLD_CONFIRM,
+            settings.IMAGE_WEIGHT, settings.AUDIO_WEIGHT, settings.USE_AUDIO,
+        )
+
+    def _build_result(
+        self,
+        image_blob: str,
+        version: str,
+        audio_blob: Optional[str],
+        img_prob: float,
+        model_version: str,
+        laps: _Laps,
+    ) -> InferenceResult:
+        with timed("fusion"):
             # Audio opcional (placeholder defendible)
             aud_prob: Optional[float] = None
             if settings.USE_AUDIO:
@@ -79,10 +405,215 @@ class InferenceService:
             final_score = settings.IMAGE_WEIGHT * img_prob + (settings.AUDIO_WEIGHT * aud_prob if aud_prob is not None else 0.0)
             status = self._status_from_score(final_score)
 
-            return InferenceResult(
-                image_probability=img_prob,
-                audio_probability=aud_prob,
-                final_score=final_score,
-                status=status,
-                meta={"image_blob": image_blob, "audio_blob": audio_blob}
-            )
+        result = InferenceResult(
+            image_probability=img_prob,
+            audio_probability=aud_prob,
+            final_score=final_score,
+            status=status,
+            meta={"image_blob": image_blob, "audio_blob": audio_blob, "model_version": model_version}
+        )
+        self.result_cache.put(self._cache_key(image_blob, version, audio_blob, model_version), asdict(result))
+
+        laps.lap("fusion")
+        result.meta["cache"] = "miss"
+        result.meta["timings_ms"] = laps.ms
+        return result
+
+    @staticmethod
+    def _coalesced(result: InferenceResult, laps: _Laps) -> InferenceResult:
+        # Resultado compartido por otra petición en curso con la misma clave:
+        # copia propia con sus tiempos de espera.
+        laps.lap("coalesced")
+        return replace(result, meta={**result.meta, "cache": "coalesced", "timings_ms": laps.ms})
+
+    def predict_from_gcs(
+        self,
+        image_blob: Optional[str] = None,
+        audio_blob: Optional[str] = None,
+        use_latest_if_missing: bool = True,
+    ) -> InferenceResult:
+        """
+        Descarga desde GCS (o usa la caché local de blobs) y predice.
+        - Si image_blob no viene y use_latest_if_missing=True, toma el último del prefijo images/
+        """
+        self.ensure_loaded()
+        laps = _Laps()
+        image_blob, version, cached = self._resolve_blob(image_blob, audio_blob, use_latest_if_missing)
+        laps.lap("resolve")
+        if cached is not None:
+            cached.meta["timings_ms"] = laps.ms
+            return cached
+
+        key = self._cache_key(image_blob, version, audio_blob, self.img_model.weights_hash)
+        result, leader = self._inflight.do(key, self._score, image_blob, version, audio_blob, laps)
+        return result if leader else self._coalesced(result, laps)
+
+    def _score(self, image_blob: str, version: str, audio_blob: Optional[str], laps: _Laps) -> InferenceResult:
+        # Si el listener MQTT ya bajó este blob se usa la copia local; si no,
+        # se descarga a memoria y se decodifica desde el buffer (sin temp files).
+        local = self.blob_cache.get_cached(image_blob)
+        if local is not None:
+            laps.lap("fetch")
+            img_prob, model_version = self.batcher.predict(str(local))
+        else:
+            with self.storage.open_blob_bytes(image_blob) as data:
+                laps.lap("fetch")
+                img_prob, model_version = self.batcher.predict(data)
+        laps.lap("infer")
+
+        return self._build_result(image_blob, version, audio_blob, img_prob, model_version, laps)
+
+    def _fetch_image(self, image_blob: str) -> ImageSource:
+        cached = self.blob_cache.get_cached(image_blob)
+        src = str(cached) if cached is not None else self.storage.download_blob_bytes(image_blob)
+        return self._prepare_image(src)
+
+    def _prepare_image(self, src: ImageSource) -> ImageSource:
+        # Con el batcher en proceso, decodificar aquí reparte el decode JPEG
+        # (que libera el GIL) entre los hilos de I/O: el batcher recibe arrays
+        # ya reducidos a 224x224. Con el pool multiproceso decodifican los workers.
+        model = self.img_model
+        if model.fast_preprocess and settings.INFERENCE_WORKERS == 0:
+            import numpy as np
+
+            return np.asarray(model.preprocessor.decode(src))
+        return src
+
+    async def _infer_async(self, img: ImageSource) -> Tuple[float, str]:
+        # Acotado: un worker colgado no retiene la petición (ni su cupo) para siempre
+        timeout = settings.INFERENCE_RESULT_TIMEOUT_S or None
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.batcher.submit(img)), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Sin resultado de inferencia tras {timeout:g} s") from None
+
+    async def predict_from_gcs_async(
+        self,
+        image_blob: Optional[str] = None,
+        audio_blob: Optional[str] = None,
+        use_latest_if_missing: bool = True,
+        on_lap: Optional[Callable[[str, float], None]] = None,
+    ) -> InferenceResult:
+        """
+        Versión async de predict_from_gcs: la E/S de GCS corre en el pool de
+        I/O y el forward en el batcher, sin ocupar hilos del event loop.
+        `on_lap` se invoca desde el event loop al terminar cada fase
+        (resolve, fetch, infer, fusion).
+        """
+        loop = asyncio.get_running_loop()
+        if not self._loaded.is_set():
+            await loop.run_in_executor(None, self.ensure_loaded)
+
+        laps = _Laps(on_lap)
+        image_blob, version, cached = await loop.run_in_executor(
+            self.io_pool, self._resolve_blob, image_blob, audio_blob, use_latest_if_missing)
+        laps.lap("resolve")
+        if cached is not None:
+            cached.meta["timings_ms"] = laps.ms
+            return cached
+
+        key = self._cache_key(image_blob, version, audio_blob, self.img_model.weights_hash)
+        result, leader = await self._inflight.do_async(
+            key, self._score_async, image_blob, version, audio_blob, laps)
+        return result if leader else self._coalesced(result, laps)
+
+    async def _score_async(
+        self,
+        image_blob: str,
+        version: str,
+        audio_blob: Optional[str],
+        laps: _Laps,
+    ) -> InferenceResult:
+        loop = asyncio.get_running_loop()
+        # bytes propios (no el buffer por hilo): el hilo de I/O queda libre
+        # mientras la imagen espera su turno en el batcher.
+        img = await loop.run_in_executor(self.io_pool, self._fetch_image, image_blob)
+        laps.lap("fetch")
+        img_prob, model_version = await self._infer_async(img)
+        laps.lap("infer")
+
+        return self._build_result(image_blob, version, audio_blob, img_prob, model_version, laps)
+
+    async def predict_batch_async(
+        self,
+        image_blobs: Sequence[str],
+        audio_blob: Optional[str] = None,
+    ) -> List[Union[InferenceResult, Exception]]:
+        """
+        Puntúa varios blobs en una llamada: descargas y decode en paralelo en
+        el pool de I/O y forwards agrupados por el batcher (hasta
+        BATCH_MAX_SIZE imágenes cada uno). Retorna, en el mismo orden, el
+        resultado o la excepción de cada blob.
+        """
+        return await asyncio.gather(
+            *(self.predict_from_gcs_async(blob, audio_blob, use_latest_if_missing=False) for blob in image_blobs),
+            return_exceptions=True,
+        )
+
+    async def predict_uploads_async(
+        self,
+        images: Sequence[Tuple[str, ImageSource]],
+        audio_blob: Optional[str] = None,
+    ) -> List[Union[InferenceResult, Exception]]:
+        """
+        Puntúa imágenes recibidas en la petición (nombre, bytes o memoryview),
+        sin pasar por el almacenamiento. La versión para la caché de
+        resultados es el hash del contenido. Mismo orden y contrato que
+        predict_batch_async.
+        """
+        return await asyncio.gather(
+            *(self._predict_upload_async(name, data, audio_blob) for name, data in images),
+            return_exceptions=True,
+        )
+
+    async def _predict_upload_async(
+        self,
+        name: str,
+        data: ImageSource,
+        audio_blob: Optional[str],
+    ) -> InferenceResult:
+        loop = asyncio.get_running_loop()
+        if not self._loaded.is_set():
+            await loop.run_in_executor(None, self.ensure_loaded)
+
+        laps = _Laps()
+        # sha256 de hasta UPLOAD_MAX_BYTES (libera el GIL) y la lectura de la
+        # caché en disco van al pool de I/O, no al event loop
+        version, key, cached, tier = await loop.run_in_executor(
+            self.io_pool, self._lookup_upload, name, data, audio_blob)
+        laps.lap("resolve")
+        if cached is not None:
+            result = InferenceResult(**cached)
+            result.meta = {**result.meta, "cache": tier, "timings_ms": laps.ms}
+            return result
+
+        result, leader = await self._inflight.do_async(
+            key, self._score_upload_async, name, data, version, audio_blob, laps)
+        return result if leader else self._coalesced(result, laps)
+
+    def _lookup_upload(
+        self,
+        name: str,
+        data: ImageSource,
+        audio_blob: Optional[str],
+    ) -> Tuple[str, str, Optional[Dict[str, Any]], Optional[str]]:
+        version = "sha256:" + hashlib.sha256(data).hexdigest()
+        key = self._cache_key(name, version, audio_blob, self.img_model.weights_hash)
+        cached, tier = self.result_cache.get(key)
+        return version, key, cached, tier
+
+    async def _score_upload_async(
+        self,
+        name: str,
+        data: ImageSource,
+        version: str,
+        audio_blob: Optional[str],
+        laps: _Laps,
+    ) -> InferenceResult:
+        # Decodifica directo desde el buffer de la petición (en el pool de I/O)
+        img = await asyncio.get_running_loop().run_in_executor(self.io_pool, self._prepare_image, data)
+        laps.lap("fetch")
+        img_prob, model_version = await self._infer_async(img)
+        laps.lap("infer")
+
+        return self._build_result(name, version, audio_blob, img_prob, model_version, laps)
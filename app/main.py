@@ -1,10 +1,16 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import logging
 
 from app.settings import settings
-from app.container import svc
-from app.mqtt_listener import start_mqtt_thread
+from app.container import broadcaster, svc
+from app import metrics, mqtt_listener
+from app.mqtt_listener import pipeline, start_mqtt_thread
+from app.upload import UploadError, split_upload
 
 logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
 logger = logging.getLogger("iot-fire-ai")
@@ -16,6 +22,8 @@ app = FastAPI(
 
 @app.on_event("startup")
 def startup_event():
+    # Carga + warmup del modelo en segundo plano; /ready indica cuándo termina
+    svc.start_background()
     start_mqtt_thread()
     logger.info("🚀 MQTT listener iniciado")
 
@@ -36,26 +44,375 @@ class PredictResponse(BaseModel):
     meta: dict
 
 
+class PredictBatchRequest(BaseModel):
+    image_blobs: list[str]
+    audio_blob: str | None = None
+
+
+class PredictBatchItem(BaseModel):
+    image_blob: str
+    ok: bool
+    result: PredictResponse | None = None
+    error: str | None = None
+
+
+class PredictBatchResponse(BaseModel):
+    results: list[PredictBatchItem]
+
+
+def to_response(res) -> PredictResponse:
+    return PredictResponse(
+        status=res.status,
+        final_score=res.final_score,
+        image_probability=res.image_probability,
+        audio_probability=res.audio_probability,
+        meta=res.meta,
+    )
+
+
 @app.get("/health")
 def health():
     return {"ok": True, "version": app.version}
 
 
+@app.get("/ready")
+def ready():
+    """Listo solo cuando el modelo está cargado y ya hizo el forward de calentamiento."""
+    body = {
+        "ready": svc.ready,
+        "model_version": svc.model_version,
+        "startup_timings_ms": svc.startup_timings,
+        "error": svc.startup_error,
+    }
+    return JSONResponse(body, status_code=200 if svc.ready else 503)
+
+
+def _loaded_attr(name: str):
+    # Antes de que el servicio cargue, las métricas que dependen de él se omiten
+    return getattr(svc, name, None)
+
+
+def _cache_counts(name: str):
+    cache = _loaded_attr(name)
+    return None if cache is None else {"hit": cache.hits, "miss": cache.misses}
+
+
+def _downloaded_images(attr: str):
+    # El downloader existe recién cuando arranca el listener MQTT
+    downloader = mqtt_listener.downloader
+    return None if downloader is None else getattr(downloader.store, attr)
+
+
+metrics.Gauge("fire_pipeline_queue_depth", "Items en cola por etapa del pipeline MQTT",
+              pipeline.queue_depths, ("stage",))
+metrics.Gauge("fire_inflight_requests", "Imágenes en curso en /predict (batch y upload cuentan cada item)", lambda: limiter.inflight)
+metrics.Gauge("fire_result_cache_lookups_total", "Consultas a la caché de resultados",
+              lambda: _cache_counts("result_cache"), ("result",), kind="counter")
+metrics.Gauge("fire_blob_cache_lookups_total", "Consultas a la caché local de blobs",
+              lambda: _cache_counts("blob_cache"), ("result",), kind="counter")
+metrics.Gauge("fire_model_info", "Versión (hash de pesos) del modelo activo",
+              lambda: {svc.model_version: 1} if svc.model_version else None, ("version",))
+metrics.Gauge("fire_ready", "1 si el modelo está cargado y calentado", lambda: int(svc.ready))
+metrics.Gauge("fire_downloaded_images", "Imágenes retenidas en DOWNLOAD_DIR",
+              lambda: _downloaded_images("files"))
+metrics.Gauge("fire_downloaded_images_bytes", "Bytes retenidos en DOWNLOAD_DIR",
+              lambda: _downloaded_images("total_bytes"))
+metrics.Gauge("fire_stream_subscribers", "Suscriptores conectados a /events/stream",
+              lambda: broadcaster.subscribers)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/admin/reload-model")
+async def reload_model(x_admin_token: str | None = Header(default=None)):
+    """Recarga los pesos en segundo plano y los intercambia sin cortar el tráfico."""
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+    try:
+        version = await asyncio.get_running_loop().run_in_executor(None, svc.reload_model)
+    except Exception as e:
+        logger.exception("Error en /admin/reload-model")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"ok": True, "model_version": version}
+
+
+class InflightLimiter:
+    """
+    Límite de imágenes en curso. Se usa solo desde el event loop, así que
+    un contador simple basta. Al superar el límite se responde 503 al instante
+    en vez de encolar sin cota.
+
+    Cada imagen ocupa una unidad: /predict/batch y /predict/upload piden
+    tantas como items. Un lote mayor que el límite solo entra sin nada más
+    en curso, así no queda rechazado para siempre.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.inflight = 0
+
+    def try_acquire(self, n: int = 1) -> bool:
+        if self.inflight and self.inflight + n > self.limit:
+            return False
+        self.inflight += n
+        return True
+
+    def release(self, n: int = 1) -> None:
+        self.inflight -= n
+
+
+limiter = InflightLimiter(settings.MAX_INFLIGHT_REQUESTS)
+
+
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest):
+    if not limiter.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio saturado, reintenta más tarde",
+            headers={"Retry-After": "1"},
+        )
     try:
-        res = svc.predict_from_gcs(
+        res = await svc.predict_from_gcs_async(
             image_blob=req.image_blob,
             audio_blob=req.audio_blob,
             use_latest_if_missing=req.use_latest_if_missing,
         )
-        return PredictResponse(
-            status=res.status,
-            final_score=res.final_score,
-            image_probability=res.image_probability,
-            audio_probability=res.audio_probability,
-            meta=res.meta,
-        )
+        svc.record_event(res, source="api")
+        return to_response(res)
     except Exception as e:
         logger.exception("Error en /predict")
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        limiter.release()
+
+
+@app.post("/predict/batch", response_model=PredictBatchResponse)
+async def predict_batch(req: PredictBatchRequest):
+    """
+    Varios blobs en una sola llamada (p. ej. los últimos N frames de una
+    cámara). Los errores se reportan por item; la respuesta siempre es 200.
+    """
+    if not req.image_blobs:
+        raise HTTPException(status_code=400, detail="image_blobs está vacío")
+    if len(req.image_blobs) > settings.PREDICT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {settings.PREDICT_BATCH_MAX_ITEMS} blobs por llamada",
+        )
+    n = len(req.image_blobs)
+    if not limiter.try_acquire(n):
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio saturado, reintenta más tarde",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        outcomes = await svc.predict_batch_async(req.image_blobs, audio_blob=req.audio_blob)
+    finally:
+        limiter.release(n)
+
+    items = []
+    for blob, res in zip(req.image_blobs, outcomes):
+        # gather(return_exceptions=True) también devuelve CancelledError
+        if isinstance(res, BaseException):
+            logger.warning("Error en /predict/batch para %s: %s", blob, res)
+            items.append(PredictBatchItem(image_blob=blob, ok=False, error=str(res)))
+        else:
+            svc.record_event(res, source="api")
+            items.append(PredictBatchItem(image_blob=blob, ok=True, result=to_response(res)))
+    return PredictBatchResponse(results=items)
+
+
+async def _read_body(request: Request, limit: int) -> bytearray:
+    # Se acumula en un solo buffer (sin archivos temporales) y se corta al
+    # superar el límite, sin esperar a recibir todo el cuerpo.
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail=f"Cuerpo mayor a {limit} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Cuerpo mayor a {limit} bytes")
+    return body
+
+
+@app.post("/predict/upload", response_model=PredictBatchResponse)
+async def predict_upload(
+    request: Request,
+    name: str = Query(default="upload", description="nombre de la imagen si el cuerpo es crudo"),
+    audio_blob: str | None = None,
+):
+    """
+    Puntúa imágenes enviadas en el cuerpo, sin GCS: multipart/form-data con
+    uno o varios archivos, o el cuerpo crudo (image/jpeg,
+    application/octet-stream) como una sola imagen. Se decodifican desde el
+    buffer de la petición. Errores por item, como /predict/batch.
+    """
+    # Una unidad mientras se lee el cuerpo; luego una por archivo
+    held = 1
+    if not limiter.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio saturado, reintenta más tarde",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        body = await _read_body(request, settings.UPLOAD_MAX_BYTES)
+        try:
+            images = split_upload(body, request.headers.get("content-type"), name)
+        except UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not images:
+            raise HTTPException(status_code=400, detail="No se recibió ningún archivo")
+        if len(images) > settings.PREDICT_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Máximo {settings.PREDICT_BATCH_MAX_ITEMS} archivos por llamada",
+            )
+        limiter.release(held)
+        held = 0
+        if not limiter.try_acquire(len(images)):
+            raise HTTPException(
+                status_code=503,
+                detail="Servicio saturado, reintenta más tarde",
+                headers={"Retry-After": "1"},
+            )
+        held = len(images)
+        outcomes = await svc.predict_uploads_async(images, audio_blob=audio_blob)
+    finally:
+        limiter.release(held)
+
+    items = []
+    for (filename, _), res in zip(images, outcomes):
+        if isinstance(res, BaseException):
+            logger.warning("Error en /predict/upload para %s: %s", filename, res)
+            items.append(PredictBatchItem(image_blob=filename, ok=False, error=str(res)))
+        else:
+            svc.record_event(res, source="upload")
+            items.append(PredictBatchItem(image_blob=filename, ok=True, result=to_response(res)))
+    return PredictBatchResponse(results=items)
+
+
+@app.post("/predict/stream")
+async def predict_stream(req: PredictRequest):
+    """
+    Igual que /predict, pero con progreso real vía Server-Sent Events: un
+    evento `stage` ({stage, ms}) al terminar cada fase (resolve, fetch,
+    infer, fusion) y al final `result` (mismo cuerpo que /predict) o `error`
+    ({detail}). Un resultado en caché solo reporta `resolve`.
+    """
+    if not limiter.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio saturado, reintenta más tarde",
+            headers={"Retry-After": "1"},
+        )
+    updates: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            res = await svc.predict_from_gcs_async(
+                image_blob=req.image_blob,
+                audio_blob=req.audio_blob,
+                use_latest_if_missing=req.use_latest_if_missing,
+                on_lap=lambda stage, ms: updates.put_nowait(("stage", {"stage": stage, "ms": ms})),
+            )
+            svc.record_event(res, source="api")
+            updates.put_nowait(("result", to_response(res).model_dump()))
+        except Exception as e:
+            logger.exception("Error en /predict/stream")
+            updates.put_nowait(("error", {"detail": str(e)}))
+        finally:
+            limiter.release()
+
+    # La predicción no depende de la conexión: si el cliente se va, termina
+    # igual (queda en caché y en el registro de eventos).
+    task = asyncio.create_task(run())
+
+    async def stream():
+        while True:
+            event, data = await updates.get()
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event != "stage":
+                await task
+                return
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class EventsResponse(BaseModel):
+    events: list[dict]
+    next_cursor: str | None
+
+
+@app.get("/events", response_model=EventsResponse)
+def list_events(
+    since: float | None = Query(default=None, description="epoch (s), inclusive"),
+    until: float | None = Query(default=None, description="epoch (s), exclusivo"),
+    device: str | None = None,
+    status: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """
+    Resultados puntuados (REST y MQTT), del más reciente al más antiguo.
+    Para la página siguiente se pasa `cursor=next_cursor` con los mismos filtros.
+    """
+    store = svc.event_store
+    if store is None:
+        raise HTTPException(status_code=404, detail="Registro de eventos desactivado (EVENT_STORE_PATH)")
+    try:
+        events, next_cursor = store.query(
+            since=since, until=until, device=device, status=status, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return EventsResponse(events=events, next_cursor=next_cursor)
+
+
+def _split(values: list[str] | None) -> list[str] | None:
+    # Acepta ?status=RIESGO&status=CONFIRMADO y ?status=RIESGO,CONFIRMADO
+    if not values:
+        return None
+    return [v.strip() for value in values for v in value.split(",") if v.strip()]
+
+
+@app.get("/events/stream")
+async def events_stream(
+    request: Request,
+    status: list[str] | None = Query(default=None),
+    device: list[str] | None = Query(default=None),
+):
+    """
+    Server-Sent Events con cada resultado puntuado por el pipeline MQTT, en
+    cuanto se produce. Filtros opcionales por estado y dispositivo. Si el
+    cliente no consume a tiempo (buffer lleno) se cierra su conexión.
+    """
+    sub = broadcaster.subscribe(statuses=_split(status), devices=_split(device))
+
+    async def stream():
+        try:
+            async for event in sub.events(settings.STREAM_HEARTBEAT_S):
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: result\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
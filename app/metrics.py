@@ -0,0 +1,210 @@
+"""
+Métricas en formato de texto de Prometheus, sin dependencias externas.
+
+En la ruta caliente no hay locks: cada hilo escribe en su propio shard (una
+lista que solo ese hilo modifica) y el scrape suma los shards. El lock solo
+se toma la primera vez que un hilo usa una métrica y al exponerlas.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Sharded:
+    """Vector de `width` acumuladores con un shard por hilo."""
+
+    def __init__(self, width: int) -> None:
+        self._width = width
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[List[float]] = []
+
+    def shard(self) -> List[float]:
+        s = getattr(self._local, "s", None)
+        if s is None:
+            s = [0.0] * self._width
+            # Los shards de hilos terminados se conservan: los contadores no retroceden
+            with self._lock:
+                self._shards.append(s)
+            self._local.s = s
+        return s
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(col) for col in zip(*shards)] if shards else [0.0] * self._width
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _Sharded] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _width(self) -> int:
+        return 1
+
+    def _child(self, values: Tuple[str, ...]) -> _Sharded:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _Sharded(self._width()))
+        return child
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child.totals()))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], totals: List[float]) -> List[str]:
+        return [f"{self.name}{self._label_str(values)} {_fmt(totals[0])}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._child(labels).shard()[0] += amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames)
+
+    def _width(self) -> int:
+        # un contador por bucket + (+Inf) + suma
+        return len(self.buckets) + 2
+
+    def observe(self, value: float, *labels: str) -> None:
+        s = self._child(labels).shard()
+        s[bisect.bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def _render_child(self, values: Tuple[str, ...], totals: List[float]) -> List[str]:
+        lines = []
+        cumulative = 0.0
+        for bound, n in zip(self.buckets + (float("inf"),), totals[:-1]):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else _fmt(bound)
+            labels = self._label_str(values, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {_fmt(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_str(values)} {_fmt(totals[-1])}")
+        lines.append(f"{self.name}_count{self._label_str(values)} {_fmt(cumulative)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Valor leído en el momento del scrape (colas, cachés, versión del modelo).
+    `fn` retorna un número o un dict {valores_de_etiquetas: número}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], object], labelnames: Sequence[str] = (),
+                 kind: str = "gauge") -> None:
+        super().__init__(name, doc, labelnames)
+        self.kind = kind
+        self._fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self._fn()
+        except Exception:
+            return lines
+        if value is None:
+            return lines
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            lines.append(f"{self.name}{self._label_str(labels)} {_fmt(float(v))}")
+        return lines
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render(metrics: Optional[Iterable[_Metric]] = None) -> str:
+    lines: List[str] = []
+    for m in metrics if metrics is not None else REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Métricas del servicio ---
+
+STAGE_SECONDS = Histogram(
+    "fire_stage_seconds",
+    "Latencia por etapa de la inferencia (resolve, download, decode, preprocess, forward, fusion)",
+    ("stage",),
+)
+BATCH_SIZE = Histogram(
+    "fire_batch_size", "Imágenes por forward del modelo", buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+MQTT_MESSAGES = Counter(
+    "fire_mqtt_messages_total",
+    "Mensajes MQTT por evento (received, dropped, parsed, failed, scored)",
+    ("event",),
+)
+
+# En los workers del pool multiproceso las observaciones se acumulan aquí y
+# viajan con el resultado al proceso de la API (ver process_pool).
+_sink: Optional[List[Tuple[str, float, Tuple[str, ...]]]] = None
+
+
+def set_sink(sink: Optional[List[Tuple[str, float, Tuple[str, ...]]]]) -> None:
+    global _sink
+    _sink = sink
+
+
+def observe(hist: Histogram, value: float, *labels: str) -> None:
+    if _sink is not None:
+        _sink.append((hist.name, value, labels))
+    else:
+        hist.observe(value, *labels)
+
+
+def replay(entries: Iterable[Tuple[str, float, Tuple[str, ...]]]) -> None:
+    """Registra observaciones hechas en otro proceso."""
+    by_name = {m.name: m for m in REGISTRY if isinstance(m, Histogram)}
+    for name, value, labels in entries:
+        by_name[name].observe(value, *labels)
+
+
+@contextmanager
+def timed(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(STAGE_SECONDS, time.perf_counter() - t0, stage)
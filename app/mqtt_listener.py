@@ -1,17 +1,30 @@
 import ssl
 import threading
 import json
+import time
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Optional
 
 import paho.mqtt.client as mqtt
 
 from app.settings import settings
-from app.container import svc
-from app.image_downloader import ImageDownloader  # 👈 NUEVO
+from app.container import broadcaster, svc
+from app.inference import InferenceResult
+from app.metrics import MQTT_MESSAGES
+from app.pipeline import Pipeline, StageConfig
 
 
-# Inicializamos el downloader (una sola vez)
-downloader = ImageDownloader(output_dir="downloaded_images")
+# Se inicializa en start_mqtt (una sola vez), cuando el servicio ya cargó GCS
+downloader = None
+
+
+@dataclass
+class MqttMessage:
+    image_blob: str
+    device: Optional[str]
+    received_at: float
+    result: Optional[InferenceResult] = None
 
 
 def on_connect(client, userdata, flags, rc):
@@ -20,8 +33,9 @@ def on_connect(client, userdata, flags, rc):
     print(f" Escuchando topic: {settings.MQTT_TOPIC}")
 
 
-def on_message(client, userdata, msg):
-    payload = msg.payload.decode().strip()
+def parse_message(payload: bytes):
+    received_at = time.time()
+    payload = payload.decode().strip()
     print("📩 Mensaje MQTT recibido:", payload)
 
     # --- Validar JSON ---
@@ -29,37 +43,95 @@ def on_message(client, userdata, msg):
         data = json.loads(payload)
     except json.JSONDecodeError:
         print("⚠️ Payload MQTT no es JSON válido:", payload)
-        return
+        MQTT_MESSAGES.inc("failed")
+        return None
 
     # --- Extraer nombre del blob ---
-    image_blob = data.get("photo")
+    image_blob = data.get("photo") if isinstance(data, dict) else None
     if not image_blob:
         print("⚠️ Mensaje MQTT sin campo 'photo'")
-        return
+        MQTT_MESSAGES.inc("failed")
+        return None
 
     print(f"📸 Imagen recibida por MQTT (GCS): {image_blob}")
+    MQTT_MESSAGES.inc("parsed")
+    device = data.get("device") or data.get("device_id")
+    return MqttMessage(image_blob=image_blob, device=str(device) if device else None, received_at=received_at)
 
+
+def download_image(msg: MqttMessage):
     # --- Descargar imagen de GCS ---
     try:
-        local_image_path = downloader.download(image_blob)
+        local_image_path = downloader.download(msg.image_blob)
         print(f"📥 Imagen descargada en local: {local_image_path}")
     except Exception as e:
         print(f"❌ Error descargando imagen desde GCS: {e}")
-        return
+        MQTT_MESSAGES.inc("failed")
+        return None
+    return msg
 
-    # --- Inferencia IA (pipeline original intacto) ---
+
+def infer_image(msg: MqttMessage):
+    # --- Inferencia IA (reutiliza la copia de la caché de blobs) ---
     try:
-        result = svc.predict_from_gcs(
-            image_blob=image_blob,
+        msg.result = svc.predict_from_gcs(
+            image_blob=msg.image_blob,
             use_latest_if_missing=False
         )
-        print("🔥 Resultado IA:", result.status, f"{result.final_score:.3f}")
-
+        return msg
     except Exception as e:
         print("❌ Error durante inferencia:", e)
+        MQTT_MESSAGES.inc("failed")
+        return None
+
+
+def emit_result(msg: MqttMessage):
+    result = msg.result
+    print("🔥 Resultado IA:", result.status, f"{result.final_score:.3f}")
+    MQTT_MESSAGES.inc("scored")
+    svc.record_event(result, source="mqtt", device=msg.device)
+    # Suscriptores de /events/stream (no bloquea)
+    broadcaster.publish({
+        **asdict(result),
+        "image_blob": msg.image_blob,
+        "device": msg.device,
+        "received_at": msg.received_at,
+        "scored_at": time.time(),
+    })
+    return None
+
+
+# receive (on_message) → parse → download → infer → emit
+pipeline = Pipeline([
+    StageConfig("parse", parse_message, settings.MQTT_PARSE_WORKERS, settings.MQTT_QUEUE_SIZE),
+    StageConfig("download", download_image, settings.MQTT_DOWNLOAD_WORKERS, settings.MQTT_QUEUE_SIZE),
+    StageConfig("infer", infer_image, settings.MQTT_INFER_WORKERS, settings.MQTT_QUEUE_SIZE),
+    StageConfig("emit", emit_result, 1, settings.MQTT_QUEUE_SIZE),
+])
+
+
+def on_message(client, userdata, msg):
+    # Solo encolar: el hilo de red de paho nunca hace I/O ni inferencia
+    MQTT_MESSAGES.inc("received")
+    if not pipeline.submit(msg.payload):
+        MQTT_MESSAGES.inc("dropped")
+        print(f"⚠️ Pipeline MQTT lleno, mensaje descartado (total descartados: {pipeline.dropped})")
 
 
 def start_mqtt():
+    global downloader
+    from app.image_downloader import ImageDownloader  # 👈 NUEVO
+
+    # Compartiendo la caché de blobs con el servicio de inferencia
+    # para no descargar dos veces cada imagen
+    try:
+        svc.ensure_loaded()
+    except Exception as e:
+        print(f"❌ Listener MQTT no iniciado, el servicio de inferencia no cargó: {e}")
+        return
+    downloader = ImageDownloader(output_dir=settings.DOWNLOAD_DIR, cache=svc.blob_cache)
+    pipeline.start()
+
     client = mqtt.Client()
     client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
     client.tls_set(tls_version=ssl.PROTOCOL_TLS)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("iot-fire-ai")
+
+# Señal interna para detener los workers de una etapa
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class StageConfig:
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 64
+
+
+class _Stage:
+    def __init__(self, cfg: StageConfig) -> None:
+        self.cfg = cfg
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=cfg.queue_size)
+        self.next: Optional[_Stage] = None
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.cfg.workers):
+            t = threading.Thread(target=self._run, name=f"pipeline-{self.cfg.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            try:
+                out = self.cfg.fn(item)
+            except Exception:
+                logger.exception("Error en etapa '%s' del pipeline", self.cfg.name)
+                continue
+            # None = el item se descarta en esta etapa (p. ej. JSON inválido)
+            if out is not None and self.next is not None:
+                # put bloqueante: si la etapa siguiente va lenta, esta también
+                # se frena y la presión llega hasta la cola de entrada.
+                self.next.queue.put(out)
+
+
+class Pipeline:
+    """
+    Pipeline por etapas unidas por colas acotadas, cada una con su propio
+    número de workers (p. ej. parse → download → infer → emit).
+
+    `submit` nunca bloquea: si la cola de entrada está llena el mensaje se
+    rechaza y se contabiliza en `dropped`. Así el hilo de red de paho sigue
+    atendiendo keepalives aunque la inferencia vaya atrasada.
+    """
+
+    def __init__(self, stages: List[StageConfig]) -> None:
+        if not stages:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self._stages = [_Stage(cfg) for cfg in stages]
+        for cur, nxt in zip(self._stages, self._stages[1:]):
+            cur.next = nxt
+        self.dropped = 0
+        self._started = False
+
+    def start(self) -> None:
+        if self._started:
+            return
+        for stage in self._stages:
+            stage.start()
+        self._started = True
+
+    def submit(self, item: Any) -> bool:
+        try:
+            self._stages[0].queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {s.cfg.name: s.queue.qsize() for s in self._stages}
+
+    def stop(self) -> None:
+        """Drena etapa por etapa y detiene los workers."""
+        for stage in self._stages:
+            for _ in stage.threads:
+                stage.queue.put(_STOP)
+            for t in stage.threads:
+                t.join()
+            stage.threads.clear()
+        self._started = False
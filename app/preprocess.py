@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import io
+import threading
+from pathlib import Path
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.metrics import timed
+
+# Entradas aceptadas por el clasificador: ruta, bytes codificados (JPEG/PNG)
+# o una imagen ya decodificada (array HWC uint8 RGB o PIL).
+ImageSource = Union[str, Path, bytes, bytearray, memoryview, np.ndarray, Image.Image]
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def load_image(src: ImageSource, draft_size: Tuple[int, int] | None = None) -> Image.Image:
+    """
+    Decodifica `src` a RGB. Con `draft_size`, los JPEG se decodifican
+    directamente a la menor escala DCT (1/2, 1/4, 1/8) que no quede por debajo
+    de ese tamaño, sin pasar por la resolución completa.
+    """
+    if isinstance(src, Image.Image):
+        return src.convert("RGB")
+    if isinstance(src, np.ndarray):
+        return Image.fromarray(src).convert("RGB")
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        img = Image.open(io.BytesIO(src))
+    else:
+        img = Image.open(src)
+
+    if draft_size is not None:
+        img.draft("RGB", draft_size)
+    # convert() fuerza la decodificación completa: el buffer de origen
+    # puede reutilizarse en cuanto esta función retorna.
+    return img.convert("RGB")
+
+
+class FastPreprocessor:
+    """
+    Preprocesamiento de inferencia equivalente a Resize + ToTensor + Normalize:
+
+    - decodificación JPEG en modo draft (reducción en el dominio DCT),
+    - resize bilineal a `size`,
+    - uint8 → float normalizado en una sola pasada NumPy sobre un buffer
+      NHWC preasignado por hilo.
+
+    El tensor resultante es una vista NCHW en formato channels_last del
+    buffer: es válido hasta la siguiente llamada en el mismo hilo.
+    """
+
+    def __init__(self, size: int = 224, max_batch: int = 32) -> None:
+        self.size = size
+        self.max_batch = max_batch
+        std = np.asarray(IMAGENET_STD, dtype=np.float32)
+        mean = np.asarray(IMAGENET_MEAN, dtype=np.float32)
+        # (x/255 - mean)/std == x*scale + shift
+        self._scale = 1.0 / (255.0 * std)
+        self._shift = -mean / std
+        self._local = threading.local()
+
+    def _buffer(self, n: int) -> np.ndarray:
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[0] < n:
+            buf = np.empty((max(n, self.max_batch), self.size, self.size, 3), dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n]
+
+    def decode(self, src: ImageSource) -> Image.Image:
+        with timed("decode"):
+            img = load_image(src, draft_size=(self.size, self.size))
+            if img.size != (self.size, self.size):
+                img = img.resize((self.size, self.size), Image.BILINEAR)
+            return img
+
+    def decode_array(self, src: ImageSource) -> np.ndarray:
+        """decode() como array HWC uint8; un array ya decodificado a `size` pasa tal cual."""
+        if isinstance(src, np.ndarray) and src.dtype == np.uint8 and src.shape == (self.size, self.size, 3):
+            return src  # p. ej. decodificada en los hilos de I/O: no se cuenta dos veces
+        return np.asarray(self.decode(src), dtype=np.uint8)
+
+    def __call__(self, srcs: Sequence[ImageSource]) -> torch.Tensor:
+        """[B,3,size,size] float32 channels_last."""
+        buf = self._buffer(len(srcs))
+        for i, src in enumerate(srcs):
+            arr = self.decode_array(src)
+            with timed("preprocess"):
+                np.multiply(arr, self._scale, out=buf[i])
+                buf[i] += self._shift
+        # NHWC contiguo permutado a NCHW == NCHW channels_last, sin copia
+        return torch.from_numpy(buf).permute(0, 3, 1, 2)
@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from PIL import Image
+
+from app import metrics
+from app.image_model import FireImageClassifier, ImageModelConfig
+from app.metrics import Counter
+
+logger = logging.getLogger("iot-fire-ai")
+
+WORKER_RESTARTS = Counter(
+    "fire_inference_worker_restarts_total",
+    "Workers de inferencia que terminaron inesperadamente y se reemplazaron",
+)
+
+# Señal de parada para un worker (y para el hilo colector)
+_STOP = None
+
+
+@dataclass(frozen=True)
+class ProcessPoolConfig:
+    workers: int = 2
+    threads_per_worker: int = 1
+    max_batch_size: int = 8
+    slots: int = 32
+    slot_bytes: int = 8 << 20  # 8 MiB por imagen codificada o decodificada
+    result_timeout_s: float = 30.0  # espera máxima de `predict` (0 = sin límite)
+    liveness_poll_s: float = 0.5  # cada cuánto se revisa que los workers sigan vivos
+
+
+def _worker_main(
+    cfg: ImageModelConfig,
+    shared_state: Optional[Dict[str, torch.Tensor]],
+    weights_hash: str,
+    slots: torch.Tensor,
+    tasks: "mp.Queue",
+    results: "mp.Queue",
+    max_batch_size: int,
+    threads: int,
+) -> None:
+    # Los pesos eager llegan como tensores en memoria compartida: no se copian
+    cfg = replace(cfg, num_threads=threads)
+    clf = FireImageClassifier(cfg, shared_state=shared_state, weights_hash=weights_hash)
+    slots_np = slots.numpy()
+    # Las métricas de decode/preprocess/forward se devuelven al proceso de la API
+    observations: List[Tuple[str, float, Tuple[str, ...]]] = []
+    metrics.set_sink(observations)
+
+    while True:
+        first = tasks.get()
+        if first is _STOP:
+            return
+        batch = [first]
+        while len(batch) < max_batch_size:
+            try:
+                nxt = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _STOP:
+                tasks.put(_STOP)
+                break
+            batch.append(nxt)
+
+        job_ids = [t[0] for t in batch]
+        try:
+            # Un item que no se decodifica falla solo él; el resto del lote sigue
+            probs = clf.predict_proba_each([_from_task(slots_np, t) for t in batch])
+        except Exception as e:
+            probs = [e] * len(batch)
+        for job_id, p in zip(job_ids, probs):
+            if isinstance(p, Exception):
+                results.put((job_id, None, f"{type(p).__name__}: {p}", observations[:]))
+            else:
+                results.put((job_id, (p, clf.weights_hash), None, observations[:]))
+            observations.clear()
+
+
+def _from_task(slots_np: np.ndarray, task: Tuple) -> Any:
+    """Reconstruye la entrada desde el slot de memoria compartida, sin copiarla."""
+    _, kind, slot, payload = task
+    if kind == "path":
+        return payload
+    if kind == "inline":
+        return payload
+    if kind == "bytes":
+        return memoryview(slots_np[slot, :payload])
+    # "array": payload = shape HWC
+    n = int(np.prod(payload))
+    return slots_np[slot, :n].reshape(payload)
+
+
+@dataclass(eq=False)
+class _Worker:
+    index: int
+    proc: mp.Process
+    tasks: "mp.Queue"
+    jobs: Set[int] = field(default_factory=set)  # enviados y sin resultado
+
+
+class ProcessInferencePool:
+    """
+    Pool de N procesos de inferencia con la misma interfaz que BatchingEngine
+    (`submit` → Future, `predict`).
+
+    - Pesos: el state_dict eager se mueve a memoria compartida y los workers
+      (spawn) lo reciben por referencia: una sola copia en RAM para N procesos.
+    - Entradas: bytes o arrays se copian una vez a un slot de un tensor uint8
+      compartido y el worker los lee como vista, sin pasar por pickle.
+    - Decodificación, preprocesamiento y forward corren en los workers, fuera
+      del GIL del proceso de la API; cada worker agrupa hasta
+      `max_batch_size` tareas por forward.
+    - Cada worker tiene su propia cola y el despacho elige el de menos tareas
+      pendientes. Si un worker muere, sus tareas fallan, sus slots se
+      liberan y se arranca otro en su lugar.
+    """
+
+    def __init__(self, model: FireImageClassifier, model_cfg: ImageModelConfig, cfg: ProcessPoolConfig) -> None:
+        self._cfg = cfg
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+
+        self._slots = torch.empty((cfg.slots, cfg.slot_bytes), dtype=torch.uint8).share_memory_()
+        self._slots_np = self._slots.numpy()
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for i in range(cfg.slots):
+            self._free_slots.put(i)
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending: Dict[int, Tuple[Future, Optional[int], _Worker]] = {}
+        self._inbox: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self._closing = False
+
+        # Argumentos de la generación actual: con ellos se reemplaza un worker caído
+        self._gen_args: Tuple = ()
+        self._workers: List[_Worker] = []
+        # Workers de generaciones anteriores que aún terminan su cola
+        self._retired: List[_Worker] = []
+        self._start_generation(model, model_cfg)
+
+        self._threads = [
+            threading.Thread(target=self._dispatch, name="pool-dispatch", daemon=True),
+            threading.Thread(target=self._collect, name="pool-collect", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _spawn(self, i: int, gen_args: Tuple) -> _Worker:
+        model_cfg, shared_state, weights_hash = gen_args
+        tasks = self._ctx.Queue()
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(model_cfg, shared_state, weights_hash, self._slots, tasks, self._results,
+                  self._cfg.max_batch_size, self._cfg.threads_per_worker),
+            name=f"inference-worker-{i}",
+            daemon=True,
+        )
+        p.start()
+        return _Worker(i, p, tasks)
+
+    def _start_generation(self, model: FireImageClassifier, model_cfg: ImageModelConfig) -> None:
+        gen_args = (model_cfg, model.share_memory(), model.weights_hash)
+        workers = [self._spawn(i, gen_args) for i in range(self._cfg.workers)]
+
+        with self._lock:
+            old = self._workers
+            self._gen_args, self._workers = gen_args, workers
+            self._retired.extend(old)
+
+        # La generación anterior termina lo que tenga en cola y sale
+        for w in old:
+            w.tasks.put(_STOP)
+
+    def swap_model(self, model: FireImageClassifier, model_cfg: ImageModelConfig) -> None:
+        """Arranca workers con el modelo nuevo y retira los anteriores (hot-reload)."""
+        self._start_generation(model, model_cfg)
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        self._inbox.put((item, fut))
+        return fut
+
+    def predict(self, item: Any) -> Any:
+        return self.submit(item).result(timeout=self._cfg.result_timeout_s or None)
+
+    def close(self) -> None:
+        dispatch, collect = self._threads
+        # Lo que ya estaba en el inbox se despacha antes de parar los workers
+        self._inbox.put(None)
+        dispatch.join()
+        with self._lock:
+            self._closing = True
+            workers = self._workers + self._retired
+        for w in workers:
+            w.tasks.put(_STOP)
+        for w in workers:
+            w.proc.join()
+        self._results.put(_STOP)
+        collect.join()
+        # Tareas de workers que murieron durante el cierre
+        with self._lock:
+            lost, self._pending = list(self._pending.values()), {}
+        for fut, _, _ in lost:
+            fut.set_exception(RuntimeError("El pool de inferencia se cerró"))
+
+    def _to_task(self, job_id: int, item: Any) -> Tuple[Tuple, Optional[int]]:
+        if isinstance(item, (str, Path)):
+            return (job_id, "path", None, str(item)), None
+
+        if isinstance(item, Image.Image):
+            item = np.asarray(item.convert("RGB"))
+        if isinstance(item, np.ndarray):
+            data, kind, payload = item.reshape(-1).view(np.uint8), "array", tuple(item.shape)
+        else:
+            data = np.frombuffer(item, dtype=np.uint8)
+            kind, payload = "bytes", len(data)
+
+        if data.nbytes > self._cfg.slot_bytes:
+            # No cabe en un slot: se envía por la cola (copia vía pickle)
+            return (job_id, "inline", None, bytes(data) if kind == "bytes" else item), None
+
+        slot = self._free_slots.get()  # bloquea si no hay slots: contrapresión
+        self._slots_np[slot, :data.nbytes] = data
+        return (job_id, kind, slot, payload), slot
+
+    def _dispatch(self) -> None:
+        while True:
+            entry = self._inbox.get()
+            if entry is None:
+                return
+            item, fut = entry
+            if not fut.set_running_or_notify_cancel():
+                continue
+            job_id = next(self._ids)
+            try:
+                task, slot = self._to_task(job_id, item)
+            except Exception as e:
+                fut.set_exception(e)
+                continue
+            with self._lock:
+                worker = min(self._workers, key=lambda w: len(w.jobs))
+                worker.jobs.add(job_id)
+                self._pending[job_id] = (fut, slot, worker)
+            worker.tasks.put(task)
+
+    def _collect(self) -> None:
+        next_check = time.monotonic() + self._cfg.liveness_poll_s
+        while True:
+            try:
+                msg = self._results.get(timeout=self._cfg.liveness_poll_s)
+            except queue.Empty:
+                msg = None
+            else:
+                if msg is _STOP:
+                    return
+                self._on_result(*msg)
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self._cfg.liveness_poll_s
+
+    def _on_result(self, job_id: int, value: Any, error: Optional[str], observations: List) -> None:
+        metrics.replay(observations)
+        with self._lock:
+            fut, slot, worker = self._pending.pop(job_id, (None, None, None))
+            if worker is not None:
+                worker.jobs.discard(job_id)
+        if slot is not None:
+            self._free_slots.put(slot)
+        if fut is None:
+            return
+        if error is not None:
+            fut.set_exception(RuntimeError(error))
+        else:
+            fut.set_result(value)
+
+    def _check_workers(self) -> None:
+        with self._lock:
+            if self._closing:
+                return
+            self._retired = [w for w in self._retired if w.proc.is_alive() or w.jobs]
+            dead = [w for w in self._workers + self._retired if not w.proc.is_alive()]
+        if not dead:
+            return
+
+        # Resultados que el worker alcanzó a enviar antes de morir
+        while True:
+            try:
+                msg = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if msg is _STOP:
+                self._results.put(_STOP)
+                break
+            self._on_result(*msg)
+
+        for w in dead:
+            with self._lock:
+                replace_it = w in self._workers
+                gen_args = self._gen_args
+            # El reemplazo se arranca fuera del lock: spawn tarda
+            new = self._spawn(w.index, gen_args) if replace_it else None
+            with self._lock:
+                lost = [self._pending.pop(job_id) for job_id in w.jobs if job_id in self._pending]
+                w.jobs.clear()
+                if w in self._retired:
+                    self._retired.remove(w)
+                if new is not None and w in self._workers and not self._closing:
+                    self._workers[self._workers.index(w)] = new
+                    new = None
+            if new is not None:
+                new.tasks.put(_STOP)
+            if replace_it:
+                logger.warning("⚠️ %s terminó (exitcode %s); %d tareas fallidas, se reemplaza",
+                               w.proc.name, w.proc.exitcode, len(lost))
+                WORKER_RESTARTS.inc()
+            error = f"{w.proc.name} terminó inesperadamente (exitcode {w.proc.exitcode})"
+            for fut, slot, _ in lost:
+                if slot is not None:
+                    self._free_slots.put(slot)
+                fut.set_exception(RuntimeError(error))
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.metrics import Counter
+
+logger = logging.getLogger("iot-fire-ai")
+
+RESULTS_DISK_DROPPED = Counter(
+    "fire_result_cache_disk_dropped_total",
+    "Resultados no escritos al nivel en disco porque la cola de escritura estaba llena",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created REAL, value TEXT);
+CREATE INDEX IF NOT EXISTS results_created ON results (created);
+"""
+
+
+@dataclass(frozen=True)
+class ResultCacheConfig:
+    max_entries: int = 10_000
+    ttl_s: float = 24 * 3600.0
+    # Ruta del SQLite para el nivel en disco; vacío = solo memoria
+    disk_path: str = ""
+    # Nivel en disco: filas máximas (0 = sin límite) y cada cuánto se podan
+    max_disk_entries: int = 200_000
+    prune_interval_s: float = 300.0
+    # Escritura por lotes en un hilo propio, como EventStore
+    batch_size: int = 256
+    flush_interval_s: float = 0.5
+    queue_size: int = 10_000
+
+
+class ResultCache:
+    """
+    Caché de resultados de inferencia en dos niveles.
+
+    - Memoria: LRU acotado a `max_entries`.
+    - Disco (opcional): SQLite WAL, sobrevive reinicios. `put` no toca el
+      disco: encola y un hilo escritor inserta por lotes; el mismo hilo borra
+      cada `prune_interval_s` lo vencido y lo que exceda `max_disk_entries`.
+
+    Las entradas expiran a los `ttl_s` segundos en ambos niveles. La clave la
+    arma el llamador (blob, generation, hash del modelo, umbrales...).
+    """
+
+    def __init__(self, cfg: ResultCacheConfig = ResultCacheConfig()) -> None:
+        self._cfg = cfg
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._queue: "queue.Queue[Optional[Tuple[Any, ...]]]" = queue.Queue(maxsize=cfg.queue_size)
+        self._writer: Optional[threading.Thread] = None
+        if cfg.disk_path:
+            Path(cfg.disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = self._connect()
+            self._db.executescript(_SCHEMA)
+            self._prune()
+            self._writer = threading.Thread(target=self._run, name="result-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._cfg.disk_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Es una caché: perder la última transacción ante un corte solo cuesta un forward
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return json.dumps(parts, separators=(",", ":"))
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Retorna (valor, nivel) con nivel 'memory' o 'disk', o (None, None)."""
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if now - entry[0] < self._cfg.ttl_s:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], "memory"
+                del self._mem[key]
+
+        if self._db is not None:
+            # Conexión por hilo: con WAL la lectura no espera al escritor
+            row = self._reader().execute(
+                "SELECT created, value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[0] < self._cfg.ttl_s:
+                value = json.loads(row[1])
+                with self._lock:
+                    self._put_mem(key, row[0], value)
+                    self.hits += 1
+                return value, "disk"
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._put_mem(key, now, value)
+        if self._db is not None:
+            try:
+                self._queue.put_nowait((key, now, value))
+            except queue.Full:
+                # Sigue en memoria; solo se pierde la copia persistente
+                RESULTS_DISK_DROPPED.inc()
+
+    def _put_mem(self, key: str, created: float, value: Dict[str, Any]) -> None:
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self._cfg.max_entries:
+            self._mem.popitem(last=False)
+
+    def flush(self) -> None:
+        """Espera a que todo lo encolado hasta ahora esté escrito."""
+        if self._writer is not None:
+            done = threading.Event()
+            self._queue.put(("flush", done))
+            done.wait()
+
+    def clear(self) -> None:
+        """Vacía ambos niveles (p. ej. entre corridas del benchmark)."""
+        with self._lock:
+            self._mem.clear()
+        if self._writer is not None:
+            done = threading.Event()
+            self._queue.put(("clear", done))
+            done.wait()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+            self._db.close()
+
+    def _prune(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self._cfg.ttl_s,))
+            if self._cfg.max_disk_entries:
+                # Las más antiguas por encima del límite (índice por created)
+                self._db.execute(
+                    "DELETE FROM results WHERE created <= ("
+                    "SELECT created FROM results ORDER BY created DESC LIMIT 1 OFFSET ?)",
+                    (self._cfg.max_disk_entries,),
+                )
+
+    def _run(self) -> None:
+        upsert = "INSERT OR REPLACE INTO results (key, created, value) VALUES (?, ?, ?)"
+        next_prune = time.monotonic() + self._cfg.prune_interval_s
+        while True:
+            try:
+                first = self._queue.get(timeout=max(next_prune - time.monotonic(), 0.0))
+            except queue.Empty:
+                batch = []
+            else:
+                # Filas (key, created, value); None o una orden (nombre, Event)
+                # cierran el lote para respetar el orden
+                batch = [first]
+                deadline = time.monotonic() + self._cfg.flush_interval_s
+                while batch[-1] is not None and len(batch[-1]) == 3 and len(batch) < self._cfg.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+
+            last = batch[-1] if batch else ()
+            command = last if last is not None and len(last) == 2 else None
+            rows = [(key, created, json.dumps(value)) for key, created, value in
+                    (r for r in batch if r is not None and len(r) == 3)]
+            try:
+                if rows:
+                    with self._db:
+                        self._db.executemany(upsert, rows)
+                if command is not None and command[0] == "clear":
+                    with self._db:
+                        self._db.execute("DELETE FROM results")
+                if time.monotonic() >= next_prune:
+                    self._prune()
+                    next_prune = time.monotonic() + self._cfg.prune_interval_s
+            except sqlite3.Error:
+                logger.exception("Error escribiendo %d resultados en la caché en disco", len(rows))
+
+            if command is not None:
+                command[1].set()
+            if batch and last is None:
+                return
@@ -15,8 +15,45 @@ class Settings(BaseSettings):
     GCS_IMAGE_PREFIX: str = "images/" ###
     GCS_AUDIO_PREFIX: str = "audio/"
 
+    # --- Almacenamiento de blobs ---
+    # gcs: bucket GCS_BUCKET | local: archivos bajo STORAGE_LOCAL_ROOT (disco/NFS,
+    # sin red ni credenciales; los prefijos GCS_* se aplican igual)
+    STORAGE_BACKEND: str = "gcs"
+    STORAGE_LOCAL_ROOT: str = "./blobs"
+
+    # --- Caché local de blobs ---
+    BLOB_CACHE_DIR: str = "./.blob_cache"
+    BLOB_CACHE_MAX_BYTES: int = 1 << 30  # 1 GiB
+    BLOB_CACHE_IDENTITY_TTL_S: float = 30.0
+
+    # --- Índice de blobs recientes (use_latest_if_missing) ---
+    LATEST_INDEX_PATH: str = "./.blob_cache/latest_index.json"
+    LATEST_INDEX_REFRESH_S: float = 5.0
+    LATEST_INDEX_FULL_RESCAN_S: float = 600.0
+
+    # --- Caché de resultados de inferencia ---
+    RESULT_CACHE_MAX_ENTRIES: int = 10_000
+    RESULT_CACHE_TTL_S: float = 24 * 3600.0
+    RESULT_CACHE_DB: str = ""  # p. ej. ./.blob_cache/results.sqlite (vacío = solo memoria)
+    RESULT_CACHE_DB_MAX_ENTRIES: int = 200_000  # filas en disco (0 = sin límite)
+    RESULT_CACHE_PRUNE_S: float = 300.0  # cada cuánto se podan filas vencidas o sobrantes
+
+    # --- Registro de eventos (resultados puntuados, /events) ---
+    EVENT_STORE_PATH: str = "./.events/events.sqlite"  # vacío = desactivado
+    EVENT_STORE_BATCH_SIZE: int = 256
+    EVENT_STORE_FLUSH_S: float = 0.5
+
     # --- Model ---
     IMAGE_MODEL_PATH: str = "./models/image_fire.pt"
+    # torch-eager | torchscript | onnxruntime (exportar con scripts/export_model.py)
+    # | torch-int8 (cuantizar con scripts/quantize_model.py)
+    IMAGE_MODEL_BACKEND: str = "torch-eager"
+    IMAGE_MODEL_TS_PATH: str = "./models/image_fire.torchscript.pt"
+    IMAGE_MODEL_ONNX_PATH: str = "./models/image_fire.onnx"
+    IMAGE_MODEL_INT8_PATH: str = "./models/image_fire.int8.pt"
+    FAST_PREPROCESS: bool = True  # decodificación JPEG draft + normalización fusionada
+    WARMUP_ON_STARTUP: bool = True  # forward de calentamiento antes de marcar /ready
+    MODEL_RELOAD_POLL_S: float = 10.0  # vigilar el archivo de pesos (0 = desactivado)
     IMG_THRESHOLD_RISK: float = 0.40
     IMG_THRESHOLD_CONFIRM: float = 0.70
 
@@ -24,6 +61,27 @@ class Settings(BaseSettings):
     IMAGE_WEIGHT: float = 0.80
     AUDIO_WEIGHT: float = 0.20
 
+    # --- Administración ---
+    ADMIN_TOKEN: str = ""  # si se define, /admin/* exige el header X-Admin-Token
+
+    # --- Inferencia (micro-batching) ---
+    BATCH_MAX_SIZE: int = 8
+    BATCH_MAX_WAIT_MS: float = 5.0
+    TORCH_NUM_THREADS: int = 0  # 0 = valor por defecto de torch
+
+    # --- Inferencia multiproceso (pesos en memoria compartida) ---
+    INFERENCE_WORKERS: int = 0  # 0 = batcher en el proceso de la API
+    INFERENCE_THREADS_PER_WORKER: int = 1
+    INFERENCE_SLOTS: int = 32
+    INFERENCE_SLOT_BYTES: int = 8 << 20  # máx. por imagen; mayores se envían por la cola
+    INFERENCE_RESULT_TIMEOUT_S: float = 30.0  # espera máxima por resultado (0 = sin límite)
+
+    # --- Concurrencia de la API ---
+    IO_POOL_WORKERS: int = 16
+    MAX_INFLIGHT_REQUESTS: int = 64  # imágenes en curso; por encima se responde 503 de inmediato
+    PREDICT_BATCH_MAX_ITEMS: int = 64  # blobs (o archivos) por llamada a /predict/batch y /predict/upload
+    UPLOAD_MAX_BYTES: int = 32 * 1024 * 1024  # cuerpo máximo de /predict/upload
+
     # --- MQTT (🔴 ESTO FALTABA) ---
     MQTT_HOST: str
     MQTT_PORT: int = 8883
@@ -31,5 +89,22 @@ class Settings(BaseSettings):
     MQTT_PASSWORD: str
     MQTT_TOPIC: str
 
+    # --- Pipeline MQTT (workers por etapa y tamaño de las colas) ---
+    MQTT_PARSE_WORKERS: int = 1
+    MQTT_DOWNLOAD_WORKERS: int = 4
+    MQTT_INFER_WORKERS: int = 4
+    MQTT_QUEUE_SIZE: int = 64
+
+    # --- Imágenes descargadas por el pipeline MQTT (retención; 0 = sin límite) ---
+    DOWNLOAD_DIR: str = "downloaded_images"
+    DOWNLOAD_MAX_BYTES: int = 10 << 30  # 10 GiB
+    DOWNLOAD_MAX_FILES: int = 200_000
+    DOWNLOAD_MAX_AGE_S: float = 7 * 24 * 3600.0
+    DOWNLOAD_RETENTION_INTERVAL_S: float = 30.0
+
+    # --- Stream de resultados (/events/stream) ---
+    STREAM_SUBSCRIBER_BUFFER: int = 100  # eventos sin leer antes de desconectar al suscriptor
+    STREAM_HEARTBEAT_S: float = 15.0
+
 
 settings = Settings()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+from app.metrics import Counter
+
+COALESCED = Counter(
+    "fire_singleflight_coalesced_total",
+    "Llamadas que esperaron el resultado de otra en curso con la misma clave",
+    ("op",),
+)
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas concurrentes con la misma clave: la primera
+    (líder) ejecuta y las demás reciben su mismo resultado o su misma
+    excepción. Al terminar, la clave se libera: la siguiente llamada vuelve
+    a ejecutar (el cacheo es cosa de quien la usa).
+
+    Sirve a hilos (`do`) y a corrutinas (`do_async`) a la vez; ambos comparten
+    la misma llamada en curso. En `do_async` el trabajo corre en su propia
+    tarea: si un solicitante se cancela (incluido el líder) solo deja de
+    esperar, el trabajo sigue para los demás.
+    """
+
+    def __init__(self, op: str) -> None:
+        self._op = op
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                COALESCED.inc(self._op)
+                return fut, False
+            fut = self._calls[key] = Future()
+            return fut, True
+
+    def _finish(self, key: Hashable, fut: Future, result: Any = None, error: BaseException | None = None) -> None:
+        # Se libera la clave antes de publicar: quien llegue después ejecuta
+        # de nuevo en vez de unirse a un resultado ya entregado.
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Tuple[Any, bool]:
+        """Ejecuta (o espera) `fn(*args)`. Retorna (resultado, fue_líder)."""
+        fut, leader = self._join(key)
+        if not leader:
+            return fut.result(), False
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result)
+        return result, True
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any) -> Tuple[Any, bool]:
+        """Versión para corrutinas: `fn(*args)` debe retornar un awaitable."""
+        fut, leader = self._join(key)
+        if leader:
+            task = asyncio.get_running_loop().create_task(fn(*args))
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: self._task_done(key, fut, t))
+        # shield: cancelar a este solicitante no cancela la llamada compartida
+        return await asyncio.shield(asyncio.wrap_future(fut)), leader
+
+    def _task_done(self, key: Hashable, fut: Future, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            # Solo ocurre si se cierra el event loop: los que esperan se cancelan
+            with self._lock:
+                self._calls.pop(key, None)
+            fut.cancel()
+        else:
+            self._finish(key, fut, task.result() if task.exception() is None else None, task.exception())
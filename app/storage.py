@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import bisect
+import mmap
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Protocol, Tuple
+
+from app.blob_index import BlobInfo
+from app.metrics import timed
+
+# Backends disponibles para STORAGE_BACKEND
+STORAGE_BACKENDS = ("gcs", "local")
+
+
+class StorageBackend(Protocol):
+    """
+    Operaciones sobre blobs que usan InferenceService, BlobCache,
+    ImageDownloader y LatestBlobIndex. Las implementan GCSClient y
+    LocalStorage. Un blob inexistente se reporta con FileNotFoundError.
+    """
+
+    def get_blob(self, blob_name: str) -> Any:
+        """Metadatos fijados a una versión: `.name`, `.generation`, `.etag`."""
+
+    def download_blob(self, blob: Any, out_path: str) -> str: ...
+
+    def download_blob_bytes(self, blob_name: str) -> bytes: ...
+
+    def open_blob_bytes(self, blob_name: str) -> ContextManager[memoryview]:
+        """Contenido del blob; la vista solo es válida dentro del `with`."""
+
+    def list_blob_infos(self, prefix: str, start_offset: Optional[str] = None) -> Iterator[BlobInfo]: ...
+
+    def find_latest_blob(self, prefix: str) -> Optional[str]: ...
+
+
+@dataclass(frozen=True)
+class LocalBlob:
+    name: str
+    path: Path
+    generation: int  # mtime en ns: cambia si el archivo se reescribe
+    size: int
+    etag: Optional[str] = None
+
+
+class LocalStorage:
+    """
+    Blobs servidos desde un directorio local o NFS: el nombre del blob es la
+    ruta relativa a `root` (p. ej. "images/cam1/frame.jpg").
+
+    Sin red ni credenciales. `open_blob_bytes` mapea el archivo en memoria
+    (mmap) y entrega una vista de solo lectura, sin copiar a un buffer.
+
+    `list_blob_infos` recorre el árbol en orden de nombre de blob y salta los
+    directorios que quedan antes de `start_offset` o fuera del prefijo; el
+    listado de cada directorio se guarda mientras su mtime no cambie. Así el
+    refresco incremental del índice de blobs no relista todo el prefijo.
+    """
+
+    # Un directorio modificado hace menos de esto no se cachea: un archivo
+    # creado en el mismo tick de mtime que el listado no se perdería
+    DIR_CACHE_MIN_AGE_NS = 1_000_000_000
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root).resolve()
+        if not self.root.is_dir():
+            raise FileNotFoundError(
+                f"Directorio de blobs no encontrado: {self.root}. "
+                "Configura STORAGE_LOCAL_ROOT correctamente."
+            )
+        self._dir_lock = threading.Lock()
+        # directorio relativo -> (mtime_ns, [(clave, es_directorio)] ordenado)
+        self._dir_cache: Dict[str, Tuple[int, List[Tuple[str, bool]]]] = {}
+
+    def _path(self, blob_name: str) -> Path:
+        path = (self.root / blob_name).resolve()
+        # Los nombres llegan por MQTT/REST: no se permite salir de root
+        if self.root not in path.parents or not path.is_file():
+            raise FileNotFoundError(f"Blob no existe en {self.root}: {blob_name}")
+        return path
+
+    def get_blob(self, blob_name: str) -> LocalBlob:
+        path = self._path(blob_name)
+        st = path.stat()
+        return LocalBlob(name=blob_name, path=path, generation=st.st_mtime_ns, size=st.st_size)
+
+    def download_blob(self, blob: LocalBlob, out_path: str) -> str:
+        out = Path(out_path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with timed("download"):
+            shutil.copyfile(blob.path, out)
+        return str(out)
+
+    def download_blob_bytes(self, blob_name: str) -> bytes:
+        with timed("download"):
+            return self._path(blob_name).read_bytes()
+
+    @contextmanager
+    def open_blob_bytes(self, blob_name: str) -> Iterator[memoryview]:
+        path = self._path(blob_name)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap no admite archivos vacíos
+                yield memoryview(b"")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def list_blob_infos(self, prefix: str, start_offset: Optional[str] = None) -> Iterator[BlobInfo]:
+        """Mismo contrato que GCSClient: orden lexicográfico desde `start_offset`."""
+        lower = max(prefix, start_offset) if start_offset else prefix
+        for name in self._walk("", prefix, lower):
+            try:
+                st = (self.root / name).stat()
+            except FileNotFoundError:
+                continue
+            yield BlobInfo(name=name, generation=st.st_mtime_ns, updated=st.st_mtime)
+
+    def _walk(self, rel_dir: str, prefix: str, lower: str) -> Iterator[str]:
+        # Un directorio "d" aparece como "d/": todo lo que contiene empieza
+        # así, y ordenar por esa clave da el orden lexicográfico de los blobs.
+        entries = self._entries(rel_dir)
+        i = bisect.bisect_left(entries, (lower,))
+        # El directorio que contiene a `lower` ordena antes que él
+        if i > 0 and entries[i - 1][1] and lower.startswith(entries[i - 1][0]):
+            i -= 1
+        for key, is_dir in entries[i:]:
+            if key > prefix and not key.startswith(prefix):
+                return
+            if is_dir:
+                yield from self._walk(key[:-1], prefix, lower)
+            elif key >= lower:
+                yield key
+
+    def _entries(self, rel_dir: str) -> List[Tuple[str, bool]]:
+        path = self.root / rel_dir
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._dir_lock:
+            cached = self._dir_cache.get(rel_dir)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        base = f"{rel_dir}/" if rel_dir else ""
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        entries.append((f"{base}{e.name}/", True))
+                    elif e.is_file():
+                        entries.append((f"{base}{e.name}", False))
+        except FileNotFoundError:
+            return []
+        entries.sort()
+        if time.time_ns() - mtime > self.DIR_CACHE_MIN_AGE_NS:
+            with self._dir_lock:
+                self._dir_cache[rel_dir] = (mtime, entries)
+        return entries
+
+    def find_latest_blob(self, prefix: str) -> Optional[str]:
+        latest = max(self.list_blob_infos(prefix), key=lambda b: b.updated, default=None)
+        return latest.name if latest else None
+
+
+def make_storage() -> StorageBackend:
+    """Backend elegido en settings (STORAGE_BACKEND)."""
+    from app.settings import settings
+
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_LOCAL_ROOT)
+    if settings.STORAGE_BACKEND == "gcs":
+        # Import diferido: el backend local no necesita google-cloud-storage
+        from app.gcs_client import GCSClient, GCSConfig
+
+        return GCSClient(GCSConfig(sa_json_path=settings.GCS_SA_JSON, bucket_name=settings.GCS_BUCKET))
+    raise ValueError(
+        f"Backend de almacenamiento desconocido: {settings.STORAGE_BACKEND}. "
+        f"Opciones: {', '.join(STORAGE_BACKENDS)}"
+    )
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional
+
+from app.metrics import Counter
+
+STREAM_DROPPED = Counter(
+    "fire_stream_subscribers_dropped_total",
+    "Suscriptores del stream de resultados desconectados por no consumir a tiempo",
+)
+
+
+class Subscription:
+    """
+    Buffer acotado de un suscriptor. Vive en el event loop de la API: el
+    publicador (hilo del pipeline) solo agenda la entrega con
+    call_soon_threadsafe, nunca espera al consumidor.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        maxsize: int,
+        statuses: Optional[FrozenSet[str]] = None,
+        devices: Optional[FrozenSet[str]] = None,
+    ) -> None:
+        self._loop = loop
+        self._queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=maxsize)
+        self.statuses = statuses
+        self.devices = devices
+        self.closed = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.statuses is not None and event.get("status") not in self.statuses:
+            return False
+        if self.devices is not None and event.get("device") not in self.devices:
+            return False
+        return True
+
+    def _offer(self, event: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Consumidor lento: se le desconecta en vez de frenar el pipeline
+            self.closed = True
+            STREAM_DROPPED.inc()
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Siguiente evento; None si venció `timeout` sin eventos."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def events(self, heartbeat_s: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Eventos hasta que se cierre (se entregan los que quedaron en el
+        buffer); produce None cada `heartbeat_s` sin tráfico.
+        """
+        while not (self.closed and self._queue.empty()):
+            event = await self.get(heartbeat_s)
+            if event is None and self.closed:
+                return
+            yield event
+
+
+class ResultBroadcaster:
+    """
+    Fan-out de resultados puntuados (pipeline MQTT) hacia suscriptores del
+    stream. `publish` es O(suscriptores) y no bloquea: cada suscriptor tiene
+    su propio buffer de `buffer_size` eventos.
+    """
+
+    def __init__(self, buffer_size: int = 100) -> None:
+        self._buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._subs: List[Subscription] = []
+
+    def subscribe(
+        self,
+        statuses: Optional[List[str]] = None,
+        devices: Optional[List[str]] = None,
+    ) -> Subscription:
+        """Debe llamarse desde el event loop que consumirá la suscripción."""
+        sub = Subscription(
+            asyncio.get_running_loop(),
+            self._buffer_size,
+            frozenset(statuses) if statuses else None,
+            frozenset(devices) if devices else None,
+        )
+        with self._lock:
+            self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        sub.closed = True
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            if sub.closed:
+                self.unsubscribe(sub)
+            elif sub.matches(event):
+                try:
+                    sub._loop.call_soon_threadsafe(sub._offer, event)
+                except RuntimeError:
+                    # El event loop del suscriptor ya terminó
+                    self.unsubscribe(sub)
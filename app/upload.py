@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13 solo expone el paquete `multipart`
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadError(ValueError):
+    """Cuerpo de /predict/upload que no se puede interpretar."""
+
+
+def split_upload(
+    body: bytearray,
+    content_type: Optional[str],
+    filename: str = "upload",
+) -> List[Tuple[str, Union[memoryview, bytes]]]:
+    """
+    Imágenes contenidas en el cuerpo de /predict/upload como (nombre, datos).
+
+    - multipart/form-data: cada parte con `filename` es una imagen (uno o
+      varios archivos); los campos de texto se ignoran.
+    - Cualquier otro Content-Type (image/jpeg, application/octet-stream...):
+      el cuerpo completo es una sola imagen llamada `filename`.
+
+    Los datos son vistas sobre `body`, sin copiar ni pasar por archivos
+    temporales; solo si una parte llega fragmentada se une en un bytes.
+    """
+    mime, params = parse_options_header(content_type)
+    if mime != b"multipart/form-data":
+        if not body:
+            raise UploadError("Cuerpo vacío: se esperaba una imagen")
+        return [(filename, memoryview(body))]
+
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadError("multipart/form-data sin boundary")
+
+    images: List[Tuple[str, Union[memoryview, bytes]]] = []
+    headers: Dict[bytes, bytes] = {}
+    field, value = bytearray(), bytearray()
+    # Tramos de datos de la parte actual: (inicio, fin) sobre body o bytes sueltos
+    spans: List[Union[Tuple[int, int], bytes]] = []
+
+    def on_part_begin() -> None:
+        headers.clear()
+        spans.clear()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(field).lower()] = bytes(value)
+        field.clear()
+        value.clear()
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        spans.append((start, end) if data is body else bytes(data[start:end]))
+
+    def on_part_end() -> None:
+        _, disposition = parse_options_header(headers.get(b"content-disposition"))
+        name = disposition.get(b"filename")
+        if name is None:
+            return
+        images.append((name.decode("utf-8", "replace") or filename, _join(body, spans)))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        # Una sola escritura: el parser entrega offsets sobre el propio body
+        parser.write(body)
+        parser.finalize()
+    except Exception as e:
+        raise UploadError(f"multipart inválido: {e}") from None
+    return images
+
+
+def _join(body: bytearray, spans: List[Union[Tuple[int, int], bytes]]) -> Union[memoryview, bytes]:
+    view = memoryview(body)
+    if all(isinstance(s, tuple) for s in spans):
+        contiguous = all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+        if spans and contiguous:
+            return view[spans[0][0]:spans[-1][1]]
+    return b"".join(view[s[0]:s[1]] if isinstance(s, tuple) else s for s in spans)
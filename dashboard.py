@@ -1,14 +1,17 @@
+import os
 import streamlit as st
 from pathlib import Path
+import json
 import requests
-from PIL import Image
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime
-import time
 import base64
 
+from app.image_index import ImageIndex
+from app.image_store import blob_name_from_path
+
 # Configuración de página
 st.set_page_config(
     page_title="FireWatch AI - Sistema de Detección de Incendios",
@@ -19,7 +22,52 @@ st.set_page_config(
 
 # URLs y directorios
 BACKEND_URL = "http://localhost:8000"
-IMAGE_DIR = Path("downloaded_images")
+# Mismo directorio que el pipeline MQTT (settings.DOWNLOAD_DIR)
+IMAGE_DIR = Path(os.getenv("DOWNLOAD_DIR", "downloaded_images"))
+
+# Imágenes por página en el selector y la galería
+GALLERY_PAGE_SIZE = 12
+GALLERY_THUMB_SIZE = (240, 170)
+
+
+@st.cache_resource
+def get_image_index() -> ImageIndex:
+    # Una instancia por proceso: metadatos y miniaturas se reutilizan entre reruns
+    return ImageIndex(str(IMAGE_DIR))
+
+
+def select_image(name: str) -> None:
+    st.session_state['selected_image_name'] = name
+
+
+# Progreso tras cada fase reportada por /predict/stream: (porcentaje, siguiente paso)
+ANALYSIS_STAGES = {
+    "resolve": (25, "📥 Descargando imagen..."),
+    "fetch": (60, "🧠 Ejecutando el modelo..."),
+    "infer": (90, "🧮 Combinando resultados..."),
+    "fusion": (100, "📦 Preparando respuesta..."),
+}
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    # Conexiones keep-alive al backend reutilizadas entre clics y reruns
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def iter_sse(response: requests.Response):
+    """(evento, datos) de una respuesta text/event-stream."""
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+            event = "message"
 
 # ========== ESTILOS CSS CON TEXTO OSCURO Y BUEN CONTRASTE ==========
 st.markdown("""
@@ -349,36 +397,51 @@ with st.sidebar:
     # Selector de imágenes
     st.markdown("### 📁 IMÁGENES DISPONIBLES")
     
-    images = sorted(IMAGE_DIR.glob("*.jpg")) + sorted(IMAGE_DIR.glob("*.jpeg")) + sorted(IMAGE_DIR.glob("*.png"))
+    # Solo se relistan los directorios que cambiaron desde el último rerun
+    image_index = get_image_index()
+    image_index.refresh()
+    total_images = image_index.count()
     
-    if not images:
+    if not total_images:
         st.error("⚠️ No se encontraron imágenes")
         st.info("Por favor, coloca imágenes en la carpeta 'downloaded_images'")
         st.stop()
     
-    image_names = [img.name for img in images]
+    total_pages = (total_images - 1) // GALLERY_PAGE_SIZE + 1
+    page_number = st.number_input(
+        f"Página (de {total_pages}):",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+        step=1,
+        help="Imágenes de la más reciente a la más antigua"
+    )
+    page_records = image_index.page(page_number - 1, GALLERY_PAGE_SIZE)
+    page_names = [rec.name for rec in page_records]
+    
+    if st.session_state.get('selected_image_name') not in page_names:
+        st.session_state['selected_image_name'] = page_names[0]
     selected_image_name = st.selectbox(
         "Selecciona una imagen:",
-        image_names,
-        index=0,
+        page_names,
+        key='selected_image_name',
+        format_func=blob_name_from_path,
         help="Elige una imagen para analizar"
     )
     
-    selected_image = IMAGE_DIR / selected_image_name
+    selected_record = page_records[page_names.index(selected_image_name)]
+    # Las imágenes se guardan en <shard>/<blob>: el backend necesita el blob
+    selected_blob = blob_name_from_path(selected_image_name)
     
     st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
     
     # Información de la imagen
     st.markdown("### 📊 INFORMACIÓN")
-    try:
-        img_info = Image.open(selected_image)
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("📏 Tamaño", f"{img_info.width}×{img_info.height}")
-        with col2:
-            st.metric("📄 Formato", selected_image.suffix[1:].upper())
-    except:
-        st.warning("No se pudo cargar la imagen")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("📏 Tamaño", f"{selected_record.width}×{selected_record.height}")
+    with col2:
+        st.metric("📄 Formato", selected_record.format)
     
     st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
     
@@ -386,7 +449,7 @@ with st.sidebar:
     st.markdown("### 📈 ESTADÍSTICAS")
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("📷 Total", len(images))
+        st.metric("📷 Total", total_images)
     with col2:
         st.metric("🕐 Actual", datetime.now().strftime("%H:%M"))
 
@@ -404,17 +467,15 @@ with col_img:
     st.markdown('<div class="card-title">📸 IMAGEN SELECCIONADA</div>', unsafe_allow_html=True)
     
     try:
-        img = Image.open(selected_image)
-        # Redimensionar para mostrar
-        img.thumbnail((500, 350), Image.Resampling.LANCZOS)  # Reducido de 600x400
-        st.image(img, use_container_width=800)
+        # Miniatura cacheada en disco: solo se decodifica la primera vez
+        st.image(str(image_index.thumbnail(selected_record)), use_container_width=800)
         
         # Información de la imagen - TEXTO OSCURO
         col_info1, col_info2 = st.columns(2)
         with col_info1:
-            st.markdown(f"**Archivo:** `{selected_image.name}`")
+            st.markdown(f"**Archivo:** `{selected_blob}`")
         with col_info2:
-            st.markdown(f"**Tamaño:** {img.width}×{img.height}")
+            st.markdown(f"**Tamaño:** {selected_record.width}×{selected_record.height}")
     except Exception as e:
         st.error(f"Error al cargar la imagen: {str(e)}")
     
@@ -428,38 +489,40 @@ with col_controls:
     # Botón de análisis
     if st.button("🚀 **EJECUTAR ANÁLISIS CON IA**", type="primary", use_container_width=True):
         with st.spinner("🔍 Analizando imagen con inteligencia artificial..."):
-            # Barra de progreso
+            # Barra de progreso con las fases reales del backend
             progress_bar = st.progress(0)
             status_text = st.empty()
-            
-            # Simulación de progreso
-            for percent in range(0, 101, 10):
-                time.sleep(0.1)
-                progress_bar.progress(percent)
-                status_text.text(f"Procesando... {percent}%")
+            status_text.text("🔎 Resolviendo imagen en el almacenamiento...")
             
             try:
-                # Llamada al backend
-                response = requests.post(
-                    f"{BACKEND_URL}/predict",
+                with get_http_session().post(
+                    f"{BACKEND_URL}/predict/stream",
                     json={
-                        "image_blob": selected_image.name,
+                        "image_blob": selected_blob,
                         "use_latest_if_missing": False
                     },
+                    stream=True,
                     timeout=30
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    st.session_state['analysis_result'] = data
-                    st.session_state['last_analyzed'] = selected_image.name
-                    st.session_state['analysis_time'] = datetime.now()
-                    status_text.text("✅ Análisis completado exitosamente!")
-                    
-                    # Mostrar resultado inmediato
-                    st.balloons()
-                else:
-                    st.error(f"❌ Error del servidor (Código: {response.status_code})")
+                ) as response:
+                    if response.status_code != 200:
+                        st.error(f"❌ Error del servidor (Código: {response.status_code})")
+                    else:
+                        for event, payload in iter_sse(response):
+                            if event == "stage" and payload["stage"] in ANALYSIS_STAGES:
+                                percent, next_step = ANALYSIS_STAGES[payload["stage"]]
+                                progress_bar.progress(percent)
+                                status_text.text(next_step)
+                            elif event == "result":
+                                progress_bar.progress(100)
+                                st.session_state['analysis_result'] = payload
+                                st.session_state['last_analyzed'] = selected_image_name
+                                st.session_state['analysis_time'] = datetime.now()
+                                status_text.text("✅ Análisis completado exitosamente!")
+                                
+                                # Mostrar resultado inmediato
+                                st.balloons()
+                            elif event == "error":
+                                st.error(f"❌ Error del servidor: {payload['detail']}")
                     
             except requests.exceptions.RequestException as e:
                 st.error(f"❌ Error de conexión: {str(e)}")
@@ -481,7 +544,25 @@ with col_controls:
     st.markdown('</div>', unsafe_allow_html=True)
 
 # ========== MOSTRAR RESULTADOS SI EXISTEN ==========
-if 'analysis_result' in st.session_state and st.session_state.get('last_analyzed') == selected_image.name:
+# ========== GALERÍA ==========
+with st.expander(f"🖼️ GALERÍA · página {page_number} de {total_pages}"):
+    gallery_cols = st.columns(4)
+    for i, rec in enumerate(page_records):
+        with gallery_cols[i % 4]:
+            try:
+                st.image(str(image_index.thumbnail(rec, GALLERY_THUMB_SIZE)), caption=blob_name_from_path(rec.name), use_container_width=True)
+            except OSError:
+                st.caption(f"⚠️ {rec.name}")
+            st.button(
+                "Seleccionar",
+                key=f"pick_{rec.name}",
+                on_click=select_image,
+                args=(rec.name,),
+                disabled=rec.name == selected_image_name,
+                use_container_width=True
+            )
+
+if 'analysis_result' in st.session_state and st.session_state.get('last_analyzed') == selected_image_name:
     data = st.session_state['analysis_result']
     
     # Segunda fila: Resultados principales en 4 columnas
@@ -784,26 +865,27 @@ if 'analysis_result' in st.session_state and st.session_state.get('last_analyzed
         st.markdown('<div class="custom-card">', unsafe_allow_html=True)
         st.markdown('<div class="card-title">📚 HISTORIAL DE ANÁLISIS</div>', unsafe_allow_html=True)
         
-        # Crear datos de historial CON INFORMACIÓN DE UMBRALES
+        # Últimos resultados reales del registro de eventos del backend (GET /events)
         history_data = []
-        current_time = datetime.now()
+        try:
+            events_resp = get_http_session().get(f"{BACKEND_URL}/events", params={"limit": 6}, timeout=5)
+            events = events_resp.json().get("events", []) if events_resp.status_code == 200 else []
+        except requests.exceptions.RequestException:
+            events = []
         
-        for i in range(6):
-            time_diff = pd.Timedelta(hours=i*2)
-            hist_prob = max(0, prob - (i*8))
-            hist_status = "FIRE" if hist_prob > 50 else "SAFE"
-            hist_threshold = "ALTO" if hist_prob > 70 else "MEDIO" if hist_prob > 40 else "BAJO"
+        for ev in events:
+            hist_threshold = {"CONFIRMADO": "ALTO", "RIESGO": "MEDIO"}.get(ev["status"], "BAJO")
             
             history_data.append({
-                "ID": f"ANL-{1000+i}",
-                "Imagen": f"img_{i+1}.jpg",
-                "Estado": hist_status,
-                "Probabilidad": hist_prob,
+                "ID": f"ANL-{ev['id']}",
+                "Imagen": Path(ev["image_blob"] or "").name,
+                "Estado": ev["status"],
+                "Probabilidad": (ev["image_probability"] or 0.0) * 100,
                 "Umbral": hist_threshold,
-                "Fecha": (current_time - time_diff).strftime("%Y-%m-%d %H:%M")
+                "Fecha": datetime.fromtimestamp(ev["ts"]).strftime("%Y-%m-%d %H:%M")
             })
         
-        df_history = pd.DataFrame(history_data)
+        df_history = pd.DataFrame(history_data, columns=["ID", "Imagen", "Estado", "Probabilidad", "Umbral", "Fecha"])
         
         # Función para colorear las filas según umbral
         def color_threshold(val):
@@ -0,0 +1,310 @@
+"""
+Benchmark offline del servicio de inferencia.
+
+Uso (desde la raíz del repo):
+    python -m scripts.benchmark --images 64 --concurrency 8
+    python -m scripts.benchmark --only throughput --batch-sizes 1,8,32 --threads 1,4
+    python -m scripts.benchmark --out bench/antes.json
+
+No necesita red ni pesos entrenados: usa efficientnet_b0 con pesos aleatorios,
+imágenes sintéticas del tamaño de las cámaras y el backend de almacenamiento
+local (app.storage.LocalStorage) en lugar de GCS.
+
+Secciones: preprocess, batching, latency (predict_proba), throughput (lote x
+hilos de torch), e2e (InferenceService.predict_from_gcs) y api (/predict con
+el TestClient de FastAPI). Los resultados se escriben en JSON (--out) para
+comparar corridas.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import timm
+import torch
+from PIL import Image
+
+from app.batching import BatchingConfig, BatchingEngine
+from app.image_model import FireImageClassifier, ImageModelConfig, build_preprocess
+from app.preprocess import FastPreprocessor, load_image
+from app.storage import LocalStorage
+
+SECTIONS = ("preprocess", "batching", "latency", "throughput", "e2e", "api")
+
+
+def make_random_weights(out_path: Path) -> None:
+    torch.manual_seed(0)
+    model = timm.create_model("efficientnet_b0", pretrained=False, num_classes=1)
+    torch.save(model.state_dict(), str(out_path))
+
+
+def make_images(out_dir: Path, n: int, size=(1920, 1080)) -> List[str]:
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        arr = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+        p = out_dir / f"frame_{i:04d}.jpg"
+        Image.fromarray(arr).save(p, quality=90)
+        paths.append(str(p))
+    return paths
+
+
+def summarize(name: str, latencies: List[float], wall: float, n: int) -> Dict[str, float]:
+    lat_ms = sorted(x * 1000 for x in latencies)
+    p99 = lat_ms[min(len(lat_ms) - 1, int(0.99 * len(lat_ms)))]
+    res = {
+        "p50_ms": statistics.median(lat_ms),
+        "p99_ms": p99,
+        "throughput_img_s": n / wall,
+    }
+    print(f"{name:<28} p50={res['p50_ms']:8.1f} ms  p99={res['p99_ms']:8.1f} ms  "
+          f"throughput={res['throughput_img_s']:7.1f} img/s")
+    return res
+
+
+def run_concurrent(fn: Callable[[str], float], paths: List[str], concurrency: int):
+    latencies: List[float] = []
+
+    def timed(p: str) -> None:
+        t0 = time.perf_counter()
+        fn(p)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, paths))
+    return latencies, time.perf_counter() - t0
+
+
+def bench_batching(clf: FireImageClassifier, paths: List[str], args) -> Dict[str, Dict[str, float]]:
+    print("== Micro-batching vs ruta por imagen ==")
+    results = {}
+
+    # Calentamiento
+    clf.predict_proba(paths[0])
+
+    lat, wall = run_concurrent(lambda p: clf.predict_proba(p), paths, 1)
+    results["per_image_sequential"] = summarize("por imagen (secuencial)", lat, wall, len(paths))
+
+    lat, wall = run_concurrent(lambda p: clf.predict_proba(p), paths, args.concurrency)
+    results["per_image_concurrent"] = summarize(
+        f"por imagen (x{args.concurrency} hilos)", lat, wall, len(paths))
+
+    engine = BatchingEngine(
+        clf.predict_proba_batch,
+        BatchingConfig(max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms),
+    )
+    try:
+        lat, wall = run_concurrent(engine.predict, paths, args.concurrency)
+        results["batching_concurrent"] = summarize(
+            f"batching (x{args.concurrency} hilos)", lat, wall, len(paths))
+    finally:
+        engine.close()
+
+    return results
+
+
+def bench_preprocess(paths: List[str], args) -> Dict[str, Dict[str, float]]:
+    print("== Decodificación + preprocesamiento por imagen ==")
+    results = {}
+    tv = build_preprocess()
+    fast = FastPreprocessor()
+
+    def time_each(fn: Callable[[str], torch.Tensor]) -> List[float]:
+        fn(paths[0])
+        lat = []
+        for p in paths:
+            t0 = time.perf_counter()
+            fn(p)
+            lat.append(time.perf_counter() - t0)
+        return lat
+
+    for name, fn in (
+        ("torchvision (original)", lambda p: tv(load_image(p))),
+        ("rápido (draft + NumPy)", lambda p: fast([p])),
+    ):
+        lat = time_each(fn)
+        results[name] = summarize(name, lat, sum(lat), len(paths))
+
+    ref = torch.stack([tv(load_image(p)) for p in paths[:8]])
+    diff = (fast(paths[:8]) - ref).abs()
+    print(f"diferencia vs torchvision: media={diff.mean():.4f} max={diff.max():.4f} (escala normalizada)")
+    return results
+
+
+def bench_latency(clf: FireImageClassifier, paths: List[str], args) -> Dict[str, Any]:
+    print("== predict_proba (una imagen, secuencial) ==")
+    srcs = [Path(p).read_bytes() for p in paths]
+    clf.predict_proba(srcs[0])
+    lat, wall = run_concurrent(clf.predict_proba, srcs, 1)
+    return summarize("predict_proba", lat, wall, len(srcs))
+
+
+def bench_throughput(clf: FireImageClassifier, paths: List[str], args) -> Dict[str, Any]:
+    print("== predict_proba_batch: throughput por tamaño de lote e hilos de torch ==")
+    srcs = [Path(p).read_bytes() for p in paths]
+    results: Dict[str, Any] = {}
+    prev_threads = torch.get_num_threads()
+    try:
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            for bs in args.batch_sizes:
+                batches = [srcs[i:i + bs] for i in range(0, len(srcs), bs)]
+                clf.predict_proba_batch(batches[0])  # calentamiento
+                lat = []
+                t0 = time.perf_counter()
+                for batch in batches:
+                    t1 = time.perf_counter()
+                    clf.predict_proba_batch(batch)
+                    lat.append(time.perf_counter() - t1)
+                wall = time.perf_counter() - t0
+                name = f"threads={threads} batch={bs}"
+                res = summarize(name, lat, wall, len(srcs))
+                res.update(threads=threads, batch_size=bs)
+                results[name] = res
+    finally:
+        torch.set_num_threads(prev_threads)
+    return results
+
+
+def _configure_service(tmp_dir: Path, weights: Path) -> None:
+    # Settings exige las variables MQTT; en el benchmark no se usa el broker
+    for var in ("MQTT_HOST", "MQTT_USERNAME", "MQTT_PASSWORD", "MQTT_TOPIC"):
+        os.environ.setdefault(var, "benchmark")
+    from app.settings import settings
+
+    settings.IMAGE_MODEL_PATH = str(weights)
+    settings.IMAGE_MODEL_BACKEND = "torch-eager"
+    settings.BLOB_CACHE_DIR = str(tmp_dir / "blob_cache")
+    settings.LATEST_INDEX_PATH = str(tmp_dir / "blob_cache" / "latest_index.json")
+    settings.RESULT_CACHE_DB = ""
+    # Los eventos de la corrida van al directorio temporal, no al registro real
+    settings.EVENT_STORE_PATH = str(tmp_dir / "events.sqlite")
+    settings.MODEL_RELOAD_POLL_S = 0
+
+
+def bench_e2e(svc, blobs: List[str], args) -> Dict[str, Any]:
+    print("== InferenceService.predict_from_gcs (almacén local) ==")
+    results = {}
+    svc.predict_from_gcs(image_blob=blobs[0])  # calentamiento
+
+    # Primera vez: lee el blob, forward y fusión (caché de resultados vacía)
+    cold = blobs[1:]
+    lat, wall = run_concurrent(lambda b: svc.predict_from_gcs(image_blob=b), cold, 1)
+    results["cold_sequential"] = summarize("sin caché (secuencial)", lat, wall, len(cold))
+
+    lat, wall = run_concurrent(lambda b: svc.predict_from_gcs(image_blob=b), cold, 1)
+    results["cached_sequential"] = summarize("caché de resultados", lat, wall, len(cold))
+    return results
+
+
+def bench_api(svc, blobs: List[str], args) -> Dict[str, Any]:
+    print("== POST /predict (TestClient de FastAPI) ==")
+    from fastapi.testclient import TestClient
+    from app import container
+
+    # app.main toma la instancia global al importarse; sin `with` no corre el
+    # startup (ni el listener MQTT).
+    container.svc = svc
+    from app.main import app
+
+    client = TestClient(app)
+    svc.result_cache.clear()
+
+    def post(blob: str) -> None:
+        r = client.post("/predict", json={"image_blob": blob, "use_latest_if_missing": False})
+        r.raise_for_status()
+
+    results = {}
+    lat, wall = run_concurrent(post, blobs, 1)
+    results["cold_sequential"] = summarize("/predict sin caché", lat, wall, len(blobs))
+    lat, wall = run_concurrent(post, blobs, 1)
+    results["cached_sequential"] = summarize("/predict caché de resultados", lat, wall, len(blobs))
+
+    # Los mismos blobs en una sola llamada a /predict/batch
+    svc.result_cache.clear()
+    t0 = time.perf_counter()
+    r = client.post("/predict/batch", json={"image_blobs": blobs})
+    r.raise_for_status()
+    wall = time.perf_counter() - t0
+    results["batch_endpoint"] = summarize(f"/predict/batch ({len(blobs)} blobs)", [wall], wall, len(blobs))
+    return results
+
+
+def run_metadata(args) -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "args": {k: v for k, v in vars(args).items() if k != "out"},
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(x) for x in value.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4, 8, 16])
+    parser.add_argument("--threads", type=_int_list, default=sorted({1, torch.get_num_threads()}))
+    parser.add_argument("--only", choices=SECTIONS, action="append", default=None,
+                        help="sección a correr (repetible); por defecto todas")
+    parser.add_argument("--out", default="benchmark_results.json", help="archivo JSON de resultados")
+    args = parser.parse_args()
+    sections = args.only or list(SECTIONS)
+
+    report: Dict[str, Any] = {"meta": run_metadata(args), "results": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        weights = tmp_dir / "random.pt"
+        make_random_weights(weights)
+        bucket = tmp_dir / "bucket"
+        (bucket / "images").mkdir(parents=True)
+        paths = make_images(bucket / "images", args.images)
+
+        if "preprocess" in sections:
+            report["results"]["preprocess"] = bench_preprocess(paths, args)
+
+        clf = FireImageClassifier(ImageModelConfig(weights_path=str(weights)))
+        for name, fn in (("batching", bench_batching), ("latency", bench_latency),
+                         ("throughput", bench_throughput)):
+            if name in sections:
+                report["results"][name] = fn(clf, paths, args)
+
+        if "e2e" in sections or "api" in sections:
+            _configure_service(tmp_dir, weights)
+            from app.inference import InferenceService
+
+            svc = InferenceService(storage=LocalStorage(str(bucket)))
+            svc.ensure_loaded()
+            blobs = [Path(p).relative_to(bucket).as_posix() for p in paths]
+            if "e2e" in sections:
+                report["results"]["e2e"] = bench_e2e(svc, blobs, args)
+            if "api" in sections:
+                report["results"]["api"] = bench_api(svc, blobs, args)
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nResultados -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
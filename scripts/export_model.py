@@ -0,0 +1,114 @@
+"""
+Exporta models/image_fire.pt a TorchScript y ONNX, verifica que los tres
+backends den las mismas probabilidades y compara su latencia en CPU.
+
+Uso (desde la raíz del repo):
+    python -m scripts.export_model
+    python -m scripts.export_model --weights models/image_fire.pt --check-images 16
+
+Luego elegir el backend con IMAGE_MODEL_BACKEND=torchscript|onnxruntime en el .env.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+
+from app.image_model import FireImageClassifier, ImageModelConfig, build_eager_model
+from scripts.benchmark import make_images
+
+
+def export_torchscript(model: torch.nn.Module, out_path: Path) -> None:
+    example = torch.randn(1, 3, 224, 224)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        traced = torch.jit.freeze(traced)
+    traced.save(str(out_path))
+    print(f"TorchScript -> {out_path}")
+
+
+def export_onnx(model: torch.nn.Module, out_path: Path, opset: int) -> None:
+    example = torch.randn(1, 3, 224, 224)
+    torch.onnx.export(
+        model,
+        example,
+        str(out_path),
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+    print(f"ONNX -> {out_path}")
+
+
+def time_batches(clf: FireImageClassifier, paths: List[str], batch_size: int, repeats: int) -> float:
+    """ms por imagen (decodificación incluida), mejor de `repeats` pasadas."""
+    clf.predict_proba_batch(paths[:batch_size])  # calentamiento
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for i in range(0, len(paths), batch_size):
+            clf.predict_proba_batch(paths[i:i + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000 / len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="models/image_fire.pt")
+    parser.add_argument("--ts-out", default="models/image_fire.torchscript.pt")
+    parser.add_argument("--onnx-out", default="models/image_fire.onnx")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--check-images", type=int, default=16)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    model = build_eager_model(args.weights)
+    export_torchscript(model, Path(args.ts_out))
+    export_onnx(model, Path(args.onnx_out), args.opset)
+
+    artifacts = {
+        "torch-eager": args.weights,
+        "torchscript": args.ts_out,
+        "onnxruntime": args.onnx_out,
+    }
+    classifiers = {
+        backend: FireImageClassifier(ImageModelConfig(weights_path=path, backend=backend))
+        for backend, path in artifacts.items()
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_images(Path(tmp), args.check_images)
+
+        # --- Equivalencia numérica contra torch-eager ---
+        print("\n== Equivalencia numérica (vs torch-eager) ==")
+        ref = classifiers["torch-eager"].predict_proba_batch(paths)
+        ok = True
+        for backend, clf in classifiers.items():
+            if backend == "torch-eager":
+                continue
+            probs = clf.predict_proba_batch(paths)
+            max_diff = max(abs(a - b) for a, b in zip(ref, probs))
+            passed = max_diff <= args.atol
+            ok &= passed
+            print(f"{backend:<12} max|Δp|={max_diff:.2e}  {'OK' if passed else 'FALLA'} (atol={args.atol})")
+
+        # --- Latencia ---
+        print("\n== Latencia por imagen (ms, incluye decodificación) ==")
+        results: Dict[str, Dict[int, float]] = {}
+        for backend, clf in classifiers.items():
+            results[backend] = {bs: time_batches(clf, paths, bs, args.repeats) for bs in (1, 8)}
+            print(f"{backend:<12} batch=1: {results[backend][1]:7.2f}   batch=8: {results[backend][8]:7.2f}")
+
+    if not ok:
+        raise SystemExit("Los modelos exportados no son numéricamente equivalentes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Decodifica y redimensiona una sola vez las imágenes de data/ (formato
+ImageFolder: una carpeta por clase) a un arreglo uint8 mapeado en memoria,
+para que las épocas de entrenamiento no vuelvan a decodificar JPEG.
+
+Archivos en --out:
+    images-<gen>.u8  filas [size, size, 3] uint8 (NHWC) contiguas
+    index.json       clases, tamaño y por imagen: ruta relativa, etiqueta,
+                     mtime, bytes y fila en el arreglo
+
+Es incremental: las imágenes nuevas o modificadas se decodifican y se
+agregan al final del arreglo; las que no cambiaron no se tocan. Las filas
+que quedan sin uso (borradas o reemplazadas) se compactan en un arreglo
+nuevo cuando superan el 25 %. El decode es el mismo de la inferencia
+(FastPreprocessor: JPEG draft + resize bilineal).
+
+Uso (desde la raíz del repo):
+    python -m scripts.prepare_dataset
+    python -m scripts.prepare_dataset --data data --out .dataset_cache --workers 8
+
+scripts/train_image.py lo ejecuta antes de entrenar y lee el cache con
+DecodedImageDataset.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from torchvision.datasets import ImageFolder
+
+from app.preprocess import FastPreprocessor
+
+INDEX_FILE = "index.json"
+CHUNK = 256  # imágenes decodificadas en memoria a la vez
+COMPACT_RATIO = 0.25  # fracción de filas sin uso que dispara la compactación
+
+
+def _load_index(cache_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((cache_dir / INDEX_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _open_images(cache_dir: Path, index: Dict[str, Any], mode: str = "r") -> np.ndarray:
+    size = index["size"]
+    shape = (index["rows"], size, size, 3)
+    if shape[0] == 0:
+        return np.empty(shape, dtype=np.uint8)
+    return np.memmap(cache_dir / index["images_file"], dtype=np.uint8, mode=mode, shape=shape)
+
+
+def prepare_dataset(data_dir: str, cache_dir: str, size: int = 224, workers: int = 8) -> Dict[str, Any]:
+    """Crea o actualiza el cache de `data_dir` en `cache_dir`. Retorna el índice."""
+    data_path, cache_path = Path(data_dir), Path(cache_dir)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    folder = ImageFolder(root=str(data_path))
+
+    samples = []
+    for path, label in folder.samples:
+        st = os.stat(path)
+        samples.append((Path(path).relative_to(data_path).as_posix(), label, st.st_mtime_ns, st.st_size))
+
+    old = _load_index(cache_path)
+    if old is None or old["size"] != size:
+        old = {"size": size, "gen": 0, "images_file": None, "rows": 0, "classes": [], "samples": [], "skipped": []}
+    known = {rel: (mtime, nbytes, row) for rel, _, mtime, nbytes, row in old["samples"]}
+    skipped = {tuple(s) for s in old["skipped"]}
+
+    rows: Dict[str, int] = {}
+    todo: List[Tuple[str, int, int]] = []
+    for rel, _, mtime, nbytes in samples:
+        prev = known.get(rel)
+        if prev is not None and prev[:2] == (mtime, nbytes):
+            rows[rel] = prev[2]
+        elif (rel, mtime, nbytes) not in skipped:
+            todo.append((rel, mtime, nbytes))
+    still_skipped = [[rel, mtime, nbytes] for rel, _, mtime, nbytes in samples if (rel, mtime, nbytes) in skipped]
+
+    if not todo and old["classes"] == folder.classes and len(rows) == len(old["samples"]):
+        print(f"Cache al día: {len(rows)} imágenes en {cache_path}")
+        return old
+
+    t0 = time.perf_counter()
+    row_bytes = size * size * 3
+    index = {**old, "classes": folder.classes}
+    compact = old["rows"] - len(rows) > COMPACT_RATIO * max(old["rows"], 1)
+    if compact or old["images_file"] is None:
+        # Arreglo nuevo con solo las filas vivas; el anterior sigue válido
+        # para el índice viejo hasta que se reemplaza index.json.
+        index["gen"] = old["gen"] + 1
+        index["images_file"] = f"images-{index['gen']}.u8"
+        old_images = _open_images(cache_path, old) if old["images_file"] else None
+        with open(cache_path / index["images_file"], "wb") as out:
+            for new_row, rel in enumerate(sorted(rows, key=rows.get)):
+                out.write(memoryview(old_images[rows[rel]]).cast("B"))
+                rows[rel] = new_row
+        index["rows"] = len(rows)
+        old_images = None
+
+    pre = FastPreprocessor(size=size)
+
+    def decode(rel: str) -> Optional[np.ndarray]:
+        try:
+            return np.asarray(pre.decode(str(data_path / rel)), dtype=np.uint8)
+        except (OSError, SyntaxError) as e:
+            print(f"[WARN] Se omite {rel}: {e}")
+            return None
+
+    # Las imágenes nuevas se agregan al final: las filas ya indexadas no cambian
+    decoded = 0
+    with open(cache_path / index["images_file"], "r+b") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        # Filas sobrantes de una ejecución interrumpida (escritas pero no
+        # indexadas) se descartan: si no, las nuevas quedarían desplazadas.
+        out.truncate(index["rows"] * row_bytes)
+        out.seek(0, os.SEEK_END)
+        # El decode JPEG libera el GIL: los hilos escalan con los núcleos
+        for start in range(0, len(todo), CHUNK):
+            chunk = todo[start:start + CHUNK]
+            for (rel, mtime, nbytes), arr in zip(chunk, pool.map(decode, [rel for rel, _, _ in chunk])):
+                if arr is None:
+                    still_skipped.append([rel, mtime, nbytes])
+                    continue
+                out.write(memoryview(np.ascontiguousarray(arr)).cast("B"))
+                rows[rel] = index["rows"]
+                index["rows"] += 1
+                decoded += 1
+            print(f"  {min(start + CHUNK, len(todo))}/{len(todo)} imágenes nuevas", end="\r")
+
+    index["samples"] = [[rel, label, mtime, nbytes, rows[rel]] for rel, label, mtime, nbytes in samples if rel in rows]
+    index["skipped"] = still_skipped
+    tmp_index = cache_path / f"{INDEX_FILE}.tmp"
+    tmp_index.write_text(json.dumps(index), encoding="utf-8")
+    os.replace(tmp_index, cache_path / INDEX_FILE)
+    if index["images_file"] != old["images_file"] and old["images_file"]:
+        (cache_path / old["images_file"]).unlink(missing_ok=True)
+
+    print(
+        f"Cache listo: {len(index['samples'])} imágenes ({decoded} decodificadas"
+        f"{', compactado' if compact else ''}) en {time.perf_counter() - t0:.1f} s -> "
+        f"{cache_path} ({index['rows'] * row_bytes / 1e9:.2f} GB)"
+    )
+    return index
+
+
+class DecodedImageDataset(Dataset):
+    """
+    Dataset sobre el cache de prepare_dataset. Cada item es (tensor uint8
+    [3, size, size], etiqueta): una vista sin copia de la fila del arreglo
+    mapeado, a la que se le aplica `transform` (transformaciones sobre
+    tensores: flips, ColorJitter, ConvertImageDtype, Normalize...).
+
+    `indices` elige un subconjunto (p. ej. train/val). El mapeo se abre en
+    cada proceso al primer acceso, así sirve con DataLoader(num_workers>0)
+    sin copiar el arreglo a los workers.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        indices: Optional[Sequence[int]] = None,
+        transform: Optional[Callable[[torch.Tensor], torch.Tensor]] = None,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        index = _load_index(self.cache_dir)
+        if index is None:
+            raise FileNotFoundError(
+                f"No hay cache en {self.cache_dir}. Ejecuta: python -m scripts.prepare_dataset"
+            )
+        self._index = index
+        self.classes: List[str] = index["classes"]
+        self.targets = [label for _, label, _, _, _ in index["samples"]]
+        self._rows = [row for _, _, _, _, row in index["samples"]]
+        self.indices = list(range(len(self.targets))) if indices is None else [int(i) for i in indices]
+        self.transform = transform
+        self._images: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Los workers del DataLoader abren su propio mapeo
+        return {**self.__dict__, "_images": None}
+
+    def __getitem__(self, i: int) -> Tuple[torch.Tensor, int]:
+        if self._images is None:
+            # Copy-on-write: tensores escribibles sin tocar el archivo
+            self._images = _open_images(self.cache_dir, self._index, mode="c")
+        j = self.indices[i]
+        x = torch.from_numpy(self._images[self._rows[j]]).permute(2, 0, 1)
+        if self.transform is not None:
+            x = self.transform(x)
+        return x, self.targets[j]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data", help="directorio ImageFolder (una carpeta por clase)")
+    parser.add_argument("--out", default=".dataset_cache", help="directorio del cache")
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="hilos de decode")
+    args = parser.parse_args()
+    prepare_dataset(args.data, args.out, size=args.size, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
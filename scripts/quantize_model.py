@@ -0,0 +1,201 @@
+"""
+Cuantiza el modelo de imágenes a INT8 y genera un reporte de precisión vs latencia.
+
+- dinámica: solo las capas Linear (pesos INT8, activaciones en runtime).
+- estática (PTQ): convs + Linear, calibrada con una muestra de data/.
+
+Cada variante se guarda como TorchScript y se carga con
+IMAGE_MODEL_BACKEND=torch-int8 (IMAGE_MODEL_INT8_PATH apunta al artefacto).
+
+Uso (desde la raíz del repo):
+    python -m scripts.quantize_model
+    python -m scripts.quantize_model --calib 200 --eval 500 --risk 0.40 --confirm 0.70
+
+El reporte compara fp32 vs INT8: latencia por imagen, memoria (RSS pico del
+proceso de evaluación y cuánto suman la carga del modelo y la inferencia),
+exactitud en IMG_THRESHOLD_RISK e IMG_THRESHOLD_CONFIRM y concordancia de
+estado con fp32.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import multiprocessing as mp
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+from torchvision.datasets import ImageFolder
+
+from app.image_model import FireImageClassifier, ImageModelConfig, build_eager_model, pick_quantized_engine
+from app.preprocess import FastPreprocessor
+
+
+def sample_dataset(data_dir: str, n: int, seed: int) -> List[Tuple[str, int]]:
+    ds = ImageFolder(root=data_dir)
+    samples = list(ds.samples)
+    random.Random(seed).shuffle(samples)
+    return samples[:n]
+
+
+def _trace(model: nn.Module, out_path: Path) -> None:
+    example = torch.randn(1, 3, 224, 224)
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, example))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    traced.save(str(out_path))
+    print(f"INT8 -> {out_path}")
+
+
+def quantize_dynamic(model: nn.Module, out_path: Path) -> None:
+    qmodel = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+    _trace(qmodel, out_path)
+
+
+def quantize_static(model: nn.Module, calib_paths: Sequence[str], out_path: Path, batch_size: int = 16) -> None:
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = pick_quantized_engine()
+    torch.backends.quantized.engine = engine
+
+    # Mismo preprocesamiento que en producción
+    preprocess = FastPreprocessor()
+
+    example = torch.randn(1, 3, 224, 224)
+    prepared = prepare_fx(copy.deepcopy(model), get_default_qconfig_mapping(engine), example_inputs=(example,))
+    with torch.no_grad():
+        for i in range(0, len(calib_paths), batch_size):
+            prepared(preprocess(calib_paths[i:i + batch_size]))
+    _trace(convert_fx(prepared), out_path)
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    """Campo de memoria de /proc/self/status (VmRSS, VmHWM) en MB; None fuera de Linux."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024  # kB
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> None:
+    # "5" reinicia VmHWM al RSS actual (Linux >= 4.0)
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def evaluate(backend: str, weights: str, samples: List[Tuple[str, int]],
+             thresholds: Dict[str, float], batch_size: int) -> Dict[str, Any]:
+    """
+    Corre en un proceso nuevo por variante. La memoria se mide con VmHWM y
+    no con ru_maxrss, que hereda el pico del proceso padre a través de
+    fork+exec y sale igual para todas las variantes.
+    """
+    _reset_peak_rss()
+    base_rss = _proc_status_mb("VmRSS")
+    clf = FireImageClassifier(ImageModelConfig(weights_path=weights, backend=backend))
+    paths = [p for p, _ in samples]
+    clf.predict_proba_batch(paths[:batch_size])  # calentamiento
+
+    t0 = time.perf_counter()
+    probs: List[float] = []
+    for i in range(0, len(paths), batch_size):
+        probs.extend(clf.predict_proba_batch(paths[i:i + batch_size]))
+    elapsed = time.perf_counter() - t0
+    peak_rss = _proc_status_mb("VmHWM")
+
+    # La etiqueta positiva es la clase 1 de ImageFolder, igual que en train_image.py
+    targets = [t for _, t in samples]
+    accuracy = {
+        name: sum((p >= thr) == (t == 1) for p, t in zip(probs, targets)) / len(targets)
+        for name, thr in thresholds.items()
+    }
+    return {
+        "backend": backend,
+        "artifact": weights,
+        "artifact_mb": Path(weights).stat().st_size / 2**20,
+        "ms_per_image": elapsed * 1000 / len(paths),
+        "peak_rss_mb": peak_rss,
+        # Carga del modelo + inferencia, sin lo que el proceso ya tenía importado
+        "model_rss_mb": None if peak_rss is None or base_rss is None else peak_rss - base_rss,
+        "accuracy": accuracy,
+        "probs": probs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="models/image_fire.pt")
+    parser.add_argument("--data", default="data")
+    parser.add_argument("--mode", choices=("dynamic", "static", "both"), default="both")
+    parser.add_argument("--out-static", default="models/image_fire.int8.pt")
+    parser.add_argument("--out-dynamic", default="models/image_fire.int8-dynamic.pt")
+    parser.add_argument("--report", default="models/quantization_report.json")
+    parser.add_argument("--calib", type=int, default=200, help="imágenes de calibración")
+    parser.add_argument("--eval", type=int, default=500, help="imágenes de evaluación")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--risk", type=float, default=0.40, help="IMG_THRESHOLD_RISK")
+    parser.add_argument("--confirm", type=float, default=0.70, help="IMG_THRESHOLD_CONFIRM")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = build_eager_model(args.weights)
+
+    samples = sample_dataset(args.data, args.calib + args.eval, args.seed)
+    if len(samples) <= args.calib:
+        raise SystemExit(f"Se necesitan más de {args.calib} imágenes en {args.data}/ (hay {len(samples)}).")
+    calib, evaluation = samples[:args.calib], samples[args.calib:]
+
+    variants = [("fp32", "torch-eager", args.weights)]
+    if args.mode in ("dynamic", "both"):
+        quantize_dynamic(model, Path(args.out_dynamic))
+        variants.append(("int8-dynamic", "torch-int8", args.out_dynamic))
+    if args.mode in ("static", "both"):
+        quantize_static(model, [p for p, _ in calib], Path(args.out_static))
+        variants.append(("int8-static", "torch-int8", args.out_static))
+
+    thresholds = {"risk": args.risk, "confirm": args.confirm}
+    ctx = mp.get_context("spawn")
+    report: Dict[str, Any] = {"eval_images": len(evaluation), "thresholds": thresholds, "variants": {}}
+    for name, backend, weights in variants:
+        with ctx.Pool(1) as pool:
+            report["variants"][name] = pool.apply(
+                evaluate, (backend, weights, evaluation, thresholds, args.batch_size))
+
+    # Concordancia de estado (NORMAL/RIESGO/CONFIRMADO) con fp32
+    def status(p: float) -> int:
+        return (p >= args.risk) + (p >= args.confirm)
+
+    def mb(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:.0f}"
+
+    ref = report["variants"]["fp32"]["probs"]
+    print(f"\n{'variante':<14}{'ms/img':>9}{'RSS MB':>9}{'ΔRSS':>7}{'MB':>7}"
+          f"{'acc@risk':>10}{'acc@conf':>10}{'=fp32':>8}{'max|Δp|':>10}")
+    for name, res in report["variants"].items():
+        probs = res.pop("probs")
+        res["status_agreement_vs_fp32"] = sum(status(a) == status(b) for a, b in zip(ref, probs)) / len(ref)
+        res["max_abs_prob_diff_vs_fp32"] = max(abs(a - b) for a, b in zip(ref, probs))
+        print(f"{name:<14}{res['ms_per_image']:9.2f}{mb(res['peak_rss_mb']):>9}{mb(res['model_rss_mb']):>7}"
+              f"{res['artifact_mb']:7.1f}"
+              f"{res['accuracy']['risk']:10.3f}{res['accuracy']['confirm']:10.3f}"
+              f"{res['status_agreement_vs_fp32']:8.3f}{res['max_abs_prob_diff_vs_fp32']:10.4f}")
+
+    Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReporte -> {args.report}")
+
+
+if __name__ == "__main__":
+    main()
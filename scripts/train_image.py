@@ -6,45 +6,50 @@ import random
 
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, random_split
-from torchvision.datasets import ImageFolder
+from torch.utils.data import DataLoader
 from torchvision import transforms
 import timm
 
+from scripts.prepare_dataset import DecodedImageDataset, prepare_dataset
+
 def main():
     data_dir = Path("data")
+    cache_dir = Path(".dataset_cache")
     out_path = Path("models/image_fire.pt")
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+    # Las imágenes ya vienen decodificadas a 224x224 uint8 [3,H,W] desde el
+    # cache (ver scripts/prepare_dataset.py): el aumento opera sobre tensores.
     tfm_train = transforms.Compose([
-        transforms.Resize((224, 224)),
         transforms.RandomHorizontalFlip(p=0.5),
         transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.1),
-        transforms.ToTensor(),
+        transforms.ConvertImageDtype(torch.float32),
         transforms.Normalize((0.485,0.456,0.406), (0.229,0.224,0.225)),
     ])
     tfm_val = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
+        transforms.ConvertImageDtype(torch.float32),
         transforms.Normalize((0.485,0.456,0.406), (0.229,0.224,0.225)),
     ])
 
-    ds = ImageFolder(root=str(data_dir), transform=tfm_train)
-    n = len(ds)
+    # Solo decodifica las imágenes nuevas o modificadas desde la última vez
+    prepare_dataset(str(data_dir), str(cache_dir), size=224, workers=os.cpu_count() or 4)
+    n = len(DecodedImageDataset(str(cache_dir)))
     if n < 50:
         print(f"[WARN] Dataset pequeño ({n}). Igual se puede fine-tunear, pero cuidado con overfitting.")
 
     val_size = max(1, int(0.2 * n))
-    train_size = n - val_size
-    ds_train, ds_val = random_split(ds, [train_size, val_size])
-
-    # Cambiar transform del val
-    ds_val.dataset.transform = tfm_val
+    perm = torch.randperm(n).tolist()
+    # Dos vistas del mismo cache, cada una con su transform
+    ds_train = DecodedImageDataset(str(cache_dir), perm[val_size:], tfm_train)
+    ds_val = DecodedImageDataset(str(cache_dir), perm[:val_size], tfm_val)
 
-    dl_train = DataLoader(ds_train, batch_size=16, shuffle=True, num_workers=0)
-    dl_val   = DataLoader(ds_val, batch_size=16, shuffle=False, num_workers=0)
+    num_workers = min(4, os.cpu_count() or 1)
+    dl_train = DataLoader(ds_train, batch_size=16, shuffle=True, num_workers=num_workers,
+                          persistent_workers=num_workers > 0, pin_memory=device.type == "cuda")
+    dl_val   = DataLoader(ds_val, batch_size=16, shuffle=False, num_workers=num_workers,
+                          persistent_workers=num_workers > 0, pin_memory=device.type == "cuda")
 
 
     # Modelo binario: 1 logit
@@ -90,7 +95,11 @@ def main():
 
         if val_acc >= best_val:
             best_val = val_acc
-            torch.save(model.state_dict(), str(out_path))
+            # Escritura atómica: el servicio recarga el modelo en caliente
+            # al ver el archivo nuevo y nunca debe leer uno a medias.
+            tmp_path = out_path.with_name(out_path.name + ".tmp")
+            torch.save(model.state_dict(), str(tmp_path))
+            os.replace(tmp_path, out_path)
             print(f"  -> Guardado mejor modelo en {out_path} (val_acc={best_val:.3f})")
 
     print("Entrenamiento terminado.")
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# app.settings exige la configuración MQTT al importarse; los tests no usan el broker
+os.environ.setdefault("MQTT_HOST", "localhost")
+os.environ.setdefault("MQTT_USERNAME", "test")
+os.environ.setdefault("MQTT_PASSWORD", "test")
+os.environ.setdefault("MQTT_TOPIC", "test")
+os.environ.setdefault("EVENT_STORE_PATH", "")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("BLOB_CACHE_DIR", tempfile.mkdtemp(prefix="fire-test-cache-"))
@@ -0,0 +1,82 @@
+"""Un item corrupto en /predict/batch o /predict/upload falla solo él."""
+import io
+
+import numpy as np
+import pytest
+import timm
+import torch
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import app.main as main
+from app.inference import InferenceService
+from app.settings import settings
+
+
+def _jpeg(color) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(np.full((120, 160, 3), color, dtype=np.uint8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def weights(tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "image_fire.pt"
+    torch.manual_seed(0)
+    torch.save(timm.create_model("efficientnet_b0", pretrained=False, num_classes=1).state_dict(), path)
+    return path
+
+
+@pytest.fixture(params=[True, False], ids=["fast-preprocess", "torchvision"])
+def client(request, tmp_path, weights, monkeypatch):
+    blobs = tmp_path / "blobs" / "images"
+    blobs.mkdir(parents=True)
+    (blobs / "f0.jpg").write_bytes(_jpeg((200, 40, 10)))
+    (blobs / "bad.jpg").write_bytes(b"esto no es un JPEG")
+    (blobs / "f2.jpg").write_bytes(_jpeg((10, 90, 30)))
+
+    for name, value in {
+        "IMAGE_MODEL_PATH": str(weights),
+        "IMAGE_MODEL_BACKEND": "torch-eager",
+        "FAST_PREPROCESS": request.param,
+        "INFERENCE_WORKERS": 0,
+        # Ventana amplia: los items corruptos y los válidos caen en el mismo lote
+        "BATCH_MAX_WAIT_MS": 200.0,
+        "STORAGE_BACKEND": "local",
+        "STORAGE_LOCAL_ROOT": str(tmp_path / "blobs"),
+        "BLOB_CACHE_DIR": str(tmp_path / "cache"),
+        "LATEST_INDEX_PATH": str(tmp_path / "cache" / "latest_index.json"),
+        "RESULT_CACHE_DB": "",
+        "EVENT_STORE_PATH": "",
+        "MODEL_RELOAD_POLL_S": 0.0,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    svc = InferenceService()
+    monkeypatch.setattr(main, "svc", svc)
+    # Sin `with`: no corre el startup (hilo MQTT)
+    return TestClient(main.app)
+
+
+def _outcomes(resp):
+    assert resp.status_code == 200
+    return {item["image_blob"]: item for item in resp.json()["results"]}
+
+
+def test_batch_isolates_corrupt_image(client):
+    items = _outcomes(client.post("/predict/batch", json={
+        "image_blobs": ["images/f0.jpg", "images/bad.jpg", "images/f2.jpg", "images/nope.jpg"],
+    }))
+    assert items["images/f0.jpg"]["ok"] and items["images/f2.jpg"]["ok"]
+    assert 0.0 <= items["images/f0.jpg"]["result"]["image_probability"] <= 1.0
+    assert not items["images/bad.jpg"]["ok"] and "identify" in items["images/bad.jpg"]["error"]
+    assert not items["images/nope.jpg"]["ok"]
+
+
+def test_upload_isolates_corrupt_image(client):
+    items = _outcomes(client.post("/predict/upload", files=[
+        ("file", ("a.jpg", _jpeg((200, 40, 10)), "image/jpeg")),
+        ("file", ("bad.jpg", b"esto no es un JPEG", "image/jpeg")),
+        ("file", ("b.jpg", _jpeg((10, 90, 30)), "image/jpeg")),
+    ]))
+    assert items["a.jpg"]["ok"] and items["b.jpg"]["ok"]
+    assert not items["bad.jpg"]["ok"]